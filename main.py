@@ -1,5 +1,8 @@
+import pandas as pd
 import streamlit as st
 
+# datasets are shared between sessions, copy on write keeps the frames derived from them from writing into them
+pd.set_option("mode.copy_on_write", True)
 
 st.set_page_config(
     page_title="Player Passing Decision Quality",
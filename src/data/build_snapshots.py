@@ -0,0 +1,23 @@
+import argparse
+
+from src.data.data_manager import DataManager
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract the tracking snapshots at the start and end of every possession")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of matches processed in parallel")
+    parser.add_argument("--tracking", action="store_true",
+                        help="also build the whole matches tracking used by the possession playback")
+    args = parser.parse_args()
+
+    manager = DataManager.from_env(workers=args.workers)
+
+    manager.load_all_snapshot_stores()
+    if args.tracking:
+        manager.load_all_tracking_stores()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class CacheManifest:
+    """Inputs and checksums of the cached artifacts, one entry file per artifact"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def entry_path(self, artifact):
+        """Get the entry file of an artifact"""
+        return f"{self.path}/{artifact}.json"
+
+    def normalize(self, inputs):
+        """Get the inputs as they are stored in an entry"""
+        return json.loads(json.dumps(inputs, sort_keys=True, default=str))
+
+    def get(self, artifact):
+        """Get the entry of an artifact or None"""
+        path = self.entry_path(artifact)
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as f:
+            return json.load(f)
+
+    def artifacts(self):
+        """Get the names of the recorded artifacts"""
+        if not os.path.isdir(self.path):
+            return []
+        return [name[:-len(".json")] for name in os.listdir(self.path) if name.endswith(".json")]
+
+    def remove(self, artifact):
+        """Remove the entry of an artifact"""
+        try:
+            os.remove(self.entry_path(artifact))
+        except FileNotFoundError:
+            pass
+
+    def is_fresh(self, artifact, inputs):
+        """Check if an artifact was built from the given inputs"""
+        entry = self.get(artifact)
+        return entry is not None and entry['inputs'] == self.normalize(inputs)
+
+    def checksum(self, artifact):
+        """Get the checksum of an artifact or None"""
+        entry = self.get(artifact)
+        return entry['checksum'] if entry is not None else None
+
+    def record(self, artifact, inputs, source_checksum=None):
+        """Record the inputs an artifact was built from"""
+
+        inputs = self.normalize(inputs)
+
+        # the checksum changes whenever the inputs or the source content change
+        content = json.dumps([inputs, source_checksum], sort_keys=True)
+        entry = {
+            'inputs': inputs,
+            'source_checksum': source_checksum,
+            'checksum': hashlib.sha256(content.encode()).hexdigest(),
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self.entry_path(artifact)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, self.entry_path(artifact))
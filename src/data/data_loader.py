@@ -1,48 +1,102 @@
 
+from types import MappingProxyType
+
 import streamlit as st
 
 from src.data.data_manager import DataManager
+from src.data.event_index import EventIndex
 from src.data.passing_evaluation import PassingEvaluation
+from src.data.player_index import PlayerIndex
 
-manager = DataManager()
+manager = DataManager.from_env(workers=4)
 pe = PassingEvaluation()
 
 
-@st.cache_data(persist="disk")
-def load_data():
-    all_events, all_pass_possessions = manager.get_data_with_passing_options()
-    all_pass_possessions = pe.compute_metrics(all_pass_possessions)
+@st.cache_resource(max_entries=2)
+def load_possessions(datasets_version):
+    """Get the possessions with their metrics, passing options and players cube"""
+    # datasets_version keys the cache on the checksums of the possessions and players,
+    # a rebuilt artifact gives a new version and the previous one is evicted
+    # the metrics only need the possessions columns they select
+    all_pass_possessions, passing_options = manager.get_data_with_passing_options(
+        columns=PassingEvaluation.columns)
+    all_pass_possessions, cube = manager.get_data_with_metrics(
+        all_pass_possessions, passing_options, PassingEvaluation())
 
-    players_data = manager.concatenate_all_matches_data()
-    players = players_data.groupby(["id", "short_name"])[
-        ["playing_time.total.minutes_played", "playing_time.total.minutes_tip"]].sum().reset_index()
+    # sorted by player so the per player views are slices of the filtered tables
+    all_pass_possessions = all_pass_possessions.sort_values(
+        'player_id', kind='stable', ignore_index=True)
 
     return {
-        "all_events": all_events,
         "all_pass_possessions": all_pass_possessions,
-        "players": players,
+        "possessions_index": EventIndex(all_pass_possessions['match_id'], all_pass_possessions['event_id']),
+        "passing_options": passing_options,
+        "cube": cube,
     }
 
 
-@st.cache_data(persist="disk")
-def load_tracking_data(match_id):
-    return manager.load_enriched_tracking_data(
-        match_id)
+@st.cache_resource(max_entries=2)
+def load_players(datasets_version):
+    """Get the playing time of every player over all matches"""
+    players_data = manager.concatenate_all_matches_data()
 
+    return players_data.groupby(["id", "short_name"], observed=True)[
+        ["playing_time.total.minutes_played", "playing_time.total.minutes_tip"]].sum().reset_index()
 
-def load_data_with_filter(third="All"):
-    data = load_data()
 
-    data['filtered_possessions'] = pe.third_filter(
-        data['all_pass_possessions'], third)
-    data['grouped_by_players'] = pe.group_by_players(
-        data['filtered_possessions'], data['players'])
+@st.cache_resource
+def load_tracking_store(match_id):
+    return manager.load_tracking_store(match_id)
+
+
+@st.cache_data
+def load_match_players(match_id):
+    return manager.load_player_data(match_id)
+
+
+def load_tracking_frame(match_id, frame, columns=("team_id",)):
+    """Get the players and ball positions at a frame with the given players columns"""
+    return manager.tracking_frame(match_id, frame, columns)
+
 
-    data['teams'] = sorted(data['filtered_possessions']
-                           ['team_shortname'].unique().tolist())
-    data['position_categories'] = sorted(
-        data['filtered_possessions']['position_category'].unique().tolist())
-    data['positions'] = sorted(
-        data['filtered_possessions']['player_position'].unique().tolist())
+def load_tracking_range(match_id, frame_start, frame_end, fps, columns=("team_id",)):
+    """Get the players and ball positions between two frames, downsampled to fps, with the given players columns"""
 
-    return data
+    # only the frames of the range are read from the memory mapped tracking
+    store = load_tracking_store(match_id)
+    step = max(1, round(store.frame_rate / fps))
+    tracking = store.frame_range(frame_start, frame_end, step)
+    players = load_match_players(match_id)[["id", *columns]]
+
+    return tracking.merge(
+        players, left_on=["player_id"], right_on=["id"])
+
+
+@st.cache_resource(max_entries=8)
+def filter_data(datasets_version, third):
+    """Get the datasets filtered by third, shared by all sessions: only the mapping is read-only, not the frames"""
+    data = {**load_possessions(datasets_version),
+            "players": load_players(datasets_version)}
+
+    filtered_possessions = pe.third_filter(data['all_pass_possessions'], third)
+    grouped_by_players = pe.group_cube_by_players(
+        data['cube'], data['players'], third)
+
+    return MappingProxyType({
+        **data,
+        'filtered_possessions': filtered_possessions,
+        'grouped_by_players': grouped_by_players,
+
+        # both tables are sorted by player_id
+        'possessions_by_player': PlayerIndex(filtered_possessions['player_id']),
+        'stats_by_player': PlayerIndex(grouped_by_players['player_id']),
+
+        'teams': sorted(filtered_possessions['team_shortname'].unique().tolist()),
+        'position_categories': sorted(filtered_possessions['position_category'].unique().tolist()),
+        'positions': sorted(filtered_possessions['player_position'].unique().tolist()),
+    })
+
+
+def load_data_with_filter(third="All"):
+    # memoised per data inputs and filters, the frames are returned without copies
+    return filter_data(manager.datasets_version(pe), third)
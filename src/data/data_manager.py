@@ -1,21 +1,149 @@
+import hashlib
+import io
+import json
 import pandas as pd
-import requests
 import numpy as np
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from src.data.cache_manifest import CacheManifest
+from src.data.data_sources import HttpDataSource, LocalDataSource
+from src.data.dtypes import apply_dtypes
+from src.data.parquet_dataset import ParquetDataset
+from src.data.passing_options import PassingOptions
+from src.data.tracking_parser import parse_tracking_lines
+from src.data.tracking_store import TrackingStore
 from src.utils.log import log_message
 
 
 class DataManager:
 
-    def __init__(self, current_dir=None, ids=[], cache=True):
+    # bump the version of an artifact when the code producing it changes
+    schema_versions = {
+        'events': 2,
+        'match': 1,
+        'players': 2,
+        'tracking_data': 1,
+        'tracking': 1,
+        'snapshots': 1,
+        'possessions': 2,
+        'metrics': 2,
+    }
+
+    def __init__(self, current_dir=None, ids=[], cache=True, workers=1, source=None):
         self._current_dir = Path(
             __file__).parent if current_dir is None else current_dir
         self.data_dir = f"{self._current_dir}/../../cache/"
         self.match_ids = ids if ids else [
             1886347, 1899585, 1925299, 1953632, 1996435, 2006229, 2011166, 2013725, 2015213, 2017461]
         self.cache = cache
+        self.workers = workers
+        self.manifest = CacheManifest(f"{self.data_dir}manifest")
+        self.source = source if source is not None else HttpDataSource(
+            cache_dir=f"{self.data_dir}http", pool_size=max(10, workers))
+        self._players = {}
+        self._validators = {}
+
+        # tables read by column and by match are partitioned by match_id
+        self.events_dataset = ParquetDataset(f"{self.data_dir}events")
+        self.possessions_dataset = ParquetDataset(f"{self.data_dir}possessions")
+        self.options_dataset = ParquetDataset(f"{self.data_dir}passing_options")
+
+    @classmethod
+    def from_env(cls, workers=1):
+        """Get a manager reading from a local clone of SkillCorner opendata when SKILLCORNER_OPENDATA_DIR is set"""
+        opendata_dir = os.environ.get("SKILLCORNER_OPENDATA_DIR")
+        return cls(workers=workers, source=LocalDataSource(opendata_dir) if opendata_dir else None)
+
+    def artifact_inputs(self, kind, dependencies=(), **inputs):
+        """Get the inputs identifying a cached artifact"""
+        return {
+            'schema_version': self.schema_versions[kind],
+            'dependencies': {name: self.manifest.checksum(name) for name in dependencies},
+            **inputs,
+        }
+
+    def source_validator(self, artifact, path):
+        """Get the validator of the source file of an artifact, requested once per manager"""
+
+        # a long running app picks up new upstream content when it restarts
+        if path not in self._validators:
+            validator = self.source.validator(path)
+            if validator is None:
+                # an unreachable source keeps the artifact built from it
+                entry = self.manifest.get(artifact)
+                validator = entry['inputs'].get('validator') if entry is not None else None
+            self._validators[path] = validator
+
+        return self._validators[path]
+
+    def source_inputs(self, artifact, path):
+        """Get the inputs identifying the source file of an artifact and its content"""
+        return {
+            'source': self.source.location(path),
+            'source_path': path,
+            'validator': self.source_validator(artifact, path),
+        }
+
+    def is_current(self, artifact):
+        """Check if an artifact and its dependencies were built from the current content of their source files"""
+
+        entry = self.manifest.get(artifact)
+        if entry is None:
+            return False
+
+        inputs = entry['inputs']
+        if 'source' in inputs and ('source_path' not in inputs or
+                                   inputs['validator'] != self.source_validator(artifact, inputs['source_path'])):
+            return False
+
+        # a dependency rebuilt since, or stale itself, makes the artifact stale
+        return all(checksum == self.manifest.checksum(name) and self.is_current(name)
+                   for name, checksum in inputs['dependencies'].items())
+
+    def is_cached(self, artifact, inputs, *paths):
+        """Check if the artifact files exist and were built from the same inputs and source content"""
+        return (self.cache and all(os.path.exists(path) for path in paths)
+                and self.manifest.is_fresh(artifact, inputs) and self.is_current(artifact))
+
+    def artifacts_version(self, artifacts, pe):
+        """Get a key identifying the recorded checksums of artifacts and the thresholds"""
+
+        # checksums change whenever an artifact is rebuilt from new inputs or source content
+        inputs = {
+            'schema_versions': self.schema_versions,
+            'thresholds': pe.thresholds_key(),
+            'checksums': {artifact: self.manifest.checksum(artifact) for artifact in artifacts},
+        }
+        return hashlib.md5(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def prepare_datasets(self, match_id):
+        """Build the possessions and players of a match if missing or stale"""
+        self.load_match_possessions(match_id, columns=['event_id'])
+
+        # the players kept in memory may be the stale ones
+        self._players.pop(match_id, None)
+        self.load_player_data(match_id)
+
+    def datasets_version(self, pe):
+        """Get a key identifying the possessions and players of all matches, building them first"""
+
+        # keyed on the checksums of the built artifacts, not on the missing ones of a cold start,
+        # the xthreat threshold derived from the data follows the possessions checksums
+        artifacts = [f"match_{match_id}_{kind}" for match_id in self.match_ids
+                     for kind in ('possessions', 'players')]
+        if self.cache and not all(self.is_current(artifact) for artifact in artifacts):
+            self.map_matches(self.prepare_datasets, "Preparing datasets")
+
+        return self.artifacts_version(artifacts, pe)
+
+    def match_version(self, match_id, pe):
+        """Get a key identifying the tracking, possessions and players a match is drawn from"""
+        # both tracking stores are built from the tracking data, building one keeps the key
+        return self.artifacts_version(
+            [f"match_{match_id}_{kind}" for kind in ('tracking_data', 'possessions', 'players')], pe)
 
     def time_to_seconds(self, time_str):
         if time_str is None:
@@ -26,41 +154,88 @@ class DataManager:
     def load_tracking_data(self, match_id):
         """Load and preprocess tracking data for a given match ID."""
 
-        raw_data = pd.read_json(
-            f"https://media.githubusercontent.com/media/SkillCorner/opendata/refs/heads/master/data/matches/{match_id}/{match_id}_tracking_extrapolated.jsonl", lines=True
-        )
+        lines = self.source.iter_lines(self.source.tracking_path(match_id))
 
-        # Flatten the nested JSON structure
-        raw_df = pd.json_normalize(
-            raw_data.to_dict("records"),
-            "player_data",
-            ["frame", "timestamp", "period", "possession", "ball_data"],
-        )
+        checksum = hashlib.sha256()
 
-        # get possesion player and group
-        raw_df["possession_player_id"] = raw_df["possession"].apply(
-            lambda x: x.get("player_id")
-        )
-        raw_df["possession_group"] = raw_df["possession"].apply(
-            lambda x: x.get("group"))
+        def hashed(lines):
+            for line in lines:
+                checksum.update(line)
+                yield line
 
-        # get the ball_data
-        raw_df[["ball_x", "ball_y", "ball_z", "is_detected_ball"]] = pd.json_normalize(
-            raw_df.ball_data
-        )
+        # parse line by line into typed columns
+        player_frames_df, frames_df = parse_tracking_lines(hashed(lines))
+
+        player_frames_df = apply_dtypes(
+            player_frames_df, f"{match_id} players tracking")
+        frames_df = apply_dtypes(frames_df, f"{match_id} frames tracking")
+        frames_df.attrs["source_checksum"] = checksum.hexdigest()
+
+        return player_frames_df, frames_df
+
+    def load_match_metadata(self, match_id):
+        """Load match metadata for match_id"""
+
+        artifact = f"match_{match_id}_match"
+        path = f"{self.data_dir}{artifact}.json"
+        source_path = self.source.metadata_path(match_id)
+        inputs = self.artifact_inputs(
+            'match', **self.source_inputs(artifact, source_path))
+
+        if self.is_cached(artifact, inputs, path):
+            with open(path) as f:
+                raw_match_data = json.load(f)
+
+            log_message(f"Found {match_id} metadata from file cache")
+        else:
+            content = self.source.read_bytes(source_path)
+            raw_match_data = json.loads(content)
+
+            if self.cache:
+
+                log_message(f"Storing {match_id} metadata to file cache")
 
-        raw_df = raw_df.drop(columns=["possession", "ball_data"])
+                with open(path, "w") as f:
+                    json.dump(raw_match_data, f)
 
-        raw_df["match_id"] = match_id
-        tracking_df = raw_df.copy()
+                self.manifest.record(
+                    artifact, inputs, hashlib.sha256(content).hexdigest())
 
-        return tracking_df
+        return raw_match_data
 
     def load_player_data(self, match_id):
         """Load match data and extract players"""
-        meta_data_github_url = f"https://raw.githubusercontent.com/SkillCorner/opendata/master/data/matches/{match_id}/{match_id}_match.json"
-        response = requests.get(meta_data_github_url)
-        raw_match_data = response.json()
+
+        if match_id in self._players:
+            return self._players[match_id]
+
+        artifact = f"match_{match_id}_players"
+        path = f"{self.data_dir}{artifact}.parquet.gzip"
+        dependencies = [f"match_{match_id}_match"]
+
+        if self.is_cached(artifact, self.artifact_inputs('players', dependencies), path):
+            players_df = pd.read_parquet(path)
+
+            log_message(f"Found {match_id} players from file cache")
+        else:
+            players_df = apply_dtypes(self.extract_players(
+                self.load_match_metadata(match_id)), f"{match_id} players")
+
+            if self.cache:
+
+                log_message(f"Storing {match_id} players to file cache")
+
+                players_df.to_parquet(path, compression='gzip')
+
+                self.manifest.record(
+                    artifact, self.artifact_inputs('players', dependencies))
+
+        self._players[match_id] = players_df
+
+        return players_df
+
+    def extract_players(self, raw_match_data):
+        """Extract players from match metadata"""
 
         raw_match_df = pd.json_normalize(raw_match_data, max_level=2)
         raw_match_df["home_team_side"] = raw_match_df["home_team_side"].astype(
@@ -161,88 +336,194 @@ class DataManager:
 
         return players_df
 
-    def load_enriched_tracking_data(self, match_id):
-        """Load tracking data with player data"""
+    def load_match_tracking(self, match_id):
+        """Load the players per frame and frames tracking tables of a match, players are joined on demand"""
 
-        path = f"{self.data_dir}match_{match_id}_enriched_tracking_data.parquet.gzip"
+        artifact = f"match_{match_id}_tracking_data"
+        path_players = f"{self.data_dir}{artifact}_players.parquet"
+        path_frames = f"{self.data_dir}{artifact}_frames.parquet"
+        inputs = self.artifact_inputs(
+            'tracking_data', **self.source_inputs(artifact, self.source.tracking_path(match_id)))
 
-        if self.cache and os.path.exists(path):
-            enriched_tracking_data = pd.read_parquet(path)
+        if self.is_cached(artifact, inputs, path_players, path_frames):
+            player_frames_df = pd.read_parquet(path_players)
+            frames_df = pd.read_parquet(path_frames)
 
             log_message(f"Found {match_id} tracking from file cache")
         else:
-            tracking_df = self.load_tracking_data(match_id)
-            players_df = self.load_player_data(match_id)
-
-            enriched_tracking_data = tracking_df.merge(
-                players_df, left_on=["player_id"], right_on=["id"]
-            )
+            player_frames_df, frames_df = self.load_tracking_data(match_id)
 
             if self.cache:
 
                 log_message(f"Storing {match_id} tracking to file cache")
 
-                enriched_tracking_data.to_parquet(path, compression='gzip')
+                player_frames_df.to_parquet(path_players, compression='zstd')
+                frames_df.to_parquet(path_frames, compression='zstd')
+
+                self.manifest.record(
+                    artifact, inputs, frames_df.attrs["source_checksum"])
+
+        return player_frames_df, frames_df
+
+    def tracking_store_path(self, match_id):
+        """Get the directory of the tracking store of a match"""
+        return f"{self.data_dir}match_{match_id}_tracking"
+
+    def load_tracking_store(self, match_id):
+        """Load the memory-mapped tracking store of a match"""
+
+        artifact = f"match_{match_id}_tracking"
+        path = self.tracking_store_path(match_id)
+        dependencies = [f"match_{match_id}_tracking_data"]
+
+        if self.is_cached(artifact, self.artifact_inputs('tracking', dependencies), path):
+            log_message(f"Found {match_id} tracking store from file cache")
+        else:
+            log_message(f"Storing {match_id} tracking store to file cache")
+
+            TrackingStore.write(path, *self.load_match_tracking(match_id))
 
-        return enriched_tracking_data
+            self.manifest.record(
+                artifact, self.artifact_inputs('tracking', dependencies))
 
-    def load_match_events(self, match_id):
-        """Load dynamic events for match_id"""
+        return TrackingStore(path)
 
-        path = f"{self.data_dir}match_{match_id}_events.parquet.gzip"
+    def snapshot_store_path(self, match_id):
+        """Get the directory of the possessions snapshot store of a match"""
+        return f"{self.data_dir}match_{match_id}_snapshots"
 
-        if self.cache and os.path.exists(path):
-            events = pd.read_parquet(path)
+    def load_snapshot_store(self, match_id):
+        """Load the tracking store of a match limited to the start and end frames of its possessions"""
+
+        artifact = f"match_{match_id}_snapshots"
+        path = self.snapshot_store_path(match_id)
+        dependencies = [f"match_{match_id}_tracking_data",
+                        f"match_{match_id}_possessions"]
+
+        if self.is_cached(artifact, self.artifact_inputs('snapshots', dependencies), path):
+            log_message(f"Found {match_id} snapshots from file cache")
+        else:
+            log_message(f"Storing {match_id} snapshots to file cache")
+
+            possessions, _ = self.load_match_possessions(
+                match_id, columns=['frame_start', 'frame_end'])
+            frames = np.union1d(possessions['frame_start'], possessions['frame_end'])
+
+            player_frames_df, frames_df = self.load_match_tracking(match_id)
+            TrackingStore.write(
+                path, player_frames_df[player_frames_df['frame'].isin(frames)], frames_df)
+
+            self.manifest.record(
+                artifact, self.artifact_inputs('snapshots', dependencies))
+
+        return TrackingStore(path)
+
+    def tracking_frame(self, match_id, frame, columns=("team_id",)):
+        """Get the players and ball positions at a frame with the given players columns"""
+
+        # possessions frames are in the snapshot store, other frames need the whole tracking
+        store = self.load_snapshot_store(match_id)
+        if store.frame_position(frame) is None:
+            store = self.load_tracking_store(match_id)
+
+        players = self.load_player_data(match_id)[["id", *columns]]
+
+        return store.frame(frame).merge(
+            players, left_on=["player_id"], right_on=["id"])
+
+    def load_match_events(self, match_id, columns=None):
+        """Load dynamic events for match_id, only with the given columns"""
+
+        artifact = f"match_{match_id}_events"
+        path = self.events_dataset.partition_path(match_id)
+        source_path = self.source.events_path(match_id)
+        inputs = self.artifact_inputs(
+            'events', **self.source_inputs(artifact, source_path))
+
+        if self.is_cached(artifact, inputs, path):
+            events = self.events_dataset.read_partition(match_id, columns)
 
             log_message(f"Found {match_id} events from file cache")
         else:
-            events = pd.read_csv(
-                f"https://raw.githubusercontent.com/SkillCorner/opendata/refs/heads/master/data/matches/{match_id}/{match_id}_dynamic_events.csv")
+            content = self.source.read_bytes(source_path)
+            events = apply_dtypes(
+                pd.read_csv(io.BytesIO(content)), f"{match_id} events")
             if self.cache:
 
                 log_message(f"Storing {match_id} events to file cache")
 
-                events.to_parquet(path, compression='gzip')
+                self.events_dataset.write_partition(match_id, events)
+
+                self.manifest.record(
+                    artifact, inputs, hashlib.sha256(content).hexdigest())
+
+            if columns is not None:
+                events = events[columns]
         return events
 
-    def concatenate_all_matches_events(self):
-        """Get events for all matches"""
+    def map_matches(self, function, label, processes=False):
+        """Apply function to every match, in a worker pool when workers > 1"""
+
+        total = len(self.match_ids)
+
+        if self.workers <= 1 or total <= 1:
+            results = []
+            for done, match_id in enumerate(self.match_ids, 1):
+                results.append(function(match_id))
+                log_message(f"{label}: {done}/{total} matches ({match_id})")
+            return results
 
-        df_list = []
-        for i in self.match_ids:
-            t = self.load_match_events(i)
-            df_list.append(t)
+        # threads for download bound work, processes for parsing bound work
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        results = {}
+        with executor_class(max_workers=min(self.workers, total)) as executor:
+            futures = {executor.submit(function, match_id): match_id
+                       for match_id in self.match_ids}
 
-        return pd.concat(df_list, ignore_index=True)
+            for done, future in enumerate(as_completed(futures), 1):
+                match_id = futures[future]
+                results[match_id] = future.result()
+                log_message(f"{label}: {done}/{total} matches ({match_id})")
+
+        # keep the order of match_ids whatever the completion order
+        return [results[match_id] for match_id in self.match_ids]
 
     def concatenate_all_matches_data(self):
         """Get all matches data"""
 
-        df_list = []
-        for i in self.match_ids:
-            t = self.load_player_data(i)
-            df_list.append(t)
+        df_list = self.map_matches(self.load_player_data, "Loading matches data")
+
+        return apply_dtypes(pd.concat(df_list, ignore_index=True))
+
+    def prepare_tracking_store(self, match_id):
+        """Build the tracking store of a match if missing and return its path"""
 
-        return pd.concat(df_list, ignore_index=True)
+        self.load_tracking_store(match_id)
 
-    def add_pass_options(self, all_events, possessions):
-        """Add passing options to possessions"""
+        return self.tracking_store_path(match_id)
 
-        possessions["passing_options"] = None
+    def load_all_tracking_stores(self):
+        """Get the tracking stores for all matches"""
 
-        for id in possessions.index:
-            match_id = possessions.loc[id]['match_id']
-            event_id = possessions.loc[id]['event_id']
+        paths = self.map_matches(
+            self.prepare_tracking_store, "Loading tracking", processes=True)
 
-            # find the associated passing options
-            pass_options = all_events[(all_events['associated_player_possession_event_id'] == event_id) & (
-                all_events['event_type'] == 'passing_option') & (all_events['match_id'] == match_id)]
+        return {match_id: TrackingStore(path) for match_id, path in zip(self.match_ids, paths)}
 
-            # get the fields
-            options = pass_options[['xthreat', 'xpass_completion',
-                                    'passing_option_score', 'associated_off_ball_run_subtype', 'pass_range']]
+    def prepare_snapshot_store(self, match_id):
+        """Build the snapshot store of a match if missing and return its path"""
 
-            possessions.at[id, 'passing_options'] = options.to_dict('records')
+        self.load_snapshot_store(match_id)
+
+        return self.snapshot_store_path(match_id)
+
+    def load_all_snapshot_stores(self):
+        """Get the snapshot stores for all matches"""
+
+        paths = self.map_matches(
+            self.prepare_snapshot_store, "Extracting snapshots", processes=True)
+
+        return {match_id: TrackingStore(path) for match_id, path in zip(self.match_ids, paths)}
 
     def add_position_category(self, events):
         """Add position category"""
@@ -256,32 +537,130 @@ class DataManager:
             'LW': 'Attacker', 'RW': 'Attacker', 'LF': 'Attacker', 'RF': 'Attacker', 'CF': 'Attacker',
         }
 
-        events['position_category'] = events['player_position'].map(
+        events['position_category'] = events['player_position'].astype(object).map(
             position_to_category).fillna('Unknown')
 
-    def get_data_with_passing_options(self):
-        """Get all dynamic events with passing options"""
+    def load_match_possessions(self, match_id, columns=None):
+        """Load possessions, only with the given columns, and their passing options for match_id"""
+
+        artifact = f"match_{match_id}_possessions"
+        path_possessions = self.possessions_dataset.partition_path(match_id)
+        path_options = self.options_dataset.partition_path(match_id)
+        dependencies = [f"match_{match_id}_events"]
+
+        if self.is_cached(artifact, self.artifact_inputs('possessions', dependencies), path_possessions, path_options):
+            possessions = self.possessions_dataset.read_partition(
+                match_id, columns)
+            options = self.options_dataset.read_partition(match_id)
 
-        path_events = f"{self.data_dir}all_events.parquet.gzip"
-        path_possessions = f"{self.data_dir}all_possessions.parquet.gzip"
+            log_message(f"Found {match_id} pass possessions from file cache")
+        else:
+            events = self.load_match_events(match_id)
+            possessions = events[events['event_type'] == 'player_possession'].reset_index(
+                drop=True)
+            options = apply_dtypes(PassingOptions.from_events(events).table)
+            self.add_position_category(possessions)
+            possessions = apply_dtypes(possessions)
+
+            if self.cache:
+
+                log_message(f"Storing {match_id} pass possessions to file cache")
+
+                self.possessions_dataset.write_partition(match_id, possessions)
+                self.options_dataset.write_partition(match_id, options)
+
+                self.manifest.record(
+                    artifact, self.artifact_inputs('possessions', dependencies))
+
+            if columns is not None:
+                possessions = possessions[columns]
+
+        return possessions, options
+
+    def get_data_with_passing_options(self, columns=None):
+        """Get all possessions, only with the given columns, with passing options"""
+
+        shards = self.map_matches(
+            lambda match_id: self.load_match_possessions(match_id, columns), "Loading pass possessions")
+
+        all_pass_possessions = apply_dtypes(pd.concat(
+            [possessions for possessions, _ in shards], ignore_index=True))
+        passing_options = PassingOptions(apply_dtypes(pd.concat(
+            [options for _, options in shards], ignore_index=True)))
+
+        return all_pass_possessions, passing_options
+
+    def load_match_metrics(self, match_id, possessions, passing_options, pe):
+        """Load computed metrics and players cube cells for match_id"""
+
+        key = pe.thresholds_key()
+        artifact = f"match_{match_id}_metrics_{key}"
+        metrics_dataset = ParquetDataset(f"{self.data_dir}metrics_{key}")
+        cube_dataset = ParquetDataset(f"{self.data_dir}cube_{key}")
+        path_metrics = metrics_dataset.partition_path(match_id)
+        path_cube = cube_dataset.partition_path(match_id)
+        dependencies = [f"match_{match_id}_possessions"]
+        thresholds = [pe.good_xpass_threshold,
+                      pe.good_xthreat_threshold, pe.realistic_xthreat_threshold]
 
-        if self.cache and os.path.exists(path_possessions) and os.path.exists(path_events):
-            all_events = pd.read_parquet(path_events)
-            all_pass_possessions = pd.read_parquet(path_possessions)
+        if self.is_cached(artifact, self.artifact_inputs('metrics', dependencies, thresholds=thresholds), path_metrics, path_cube):
+            metrics = metrics_dataset.read_partition(match_id)
+            cube = cube_dataset.read_partition(match_id)
 
-            log_message("Found all pass possessions from file cache")
+            log_message(f"Found {match_id} metrics from file cache")
         else:
-            all_events = self.concatenate_all_matches_events()
-            all_pass_possessions = all_events[(
-                all_events['event_type'] == 'player_possession')]
-            self.add_pass_options(all_events, all_pass_possessions)
-            self.add_position_category(all_pass_possessions)
+            metrics = pe.compute_metrics(
+                possessions, passing_options).reset_index(drop=True)
+            cube = pe.build_cube(metrics)
 
             if self.cache:
-                all_pass_possessions.to_parquet(
-                    path_possessions, compression='gzip')
-                all_events.to_parquet(path_events, compression='gzip')
 
-                log_message("Store all pass possessions to cache")
+                log_message(f"Storing {match_id} metrics to file cache")
+
+                metrics_dataset.write_partition(match_id, metrics)
+                cube_dataset.write_partition(match_id, cube)
+
+                self.manifest.record(artifact, self.artifact_inputs(
+                    'metrics', dependencies, thresholds=thresholds))
+
+        return metrics, cube
+
+    def prune_metrics(self, key):
+        """Remove the metrics and cubes computed with other thresholds than key"""
+
+        # the xthreat threshold is derived from all matches, adding a match recomputes every shard
+        for name in os.listdir(self.data_dir):
+            kind, _, other_key = name.partition("_")
+            if kind in ("metrics", "cube") and other_key != key:
+                log_message(f"Removing outdated {name} from file cache")
+                shutil.rmtree(f"{self.data_dir}{name}", ignore_errors=True)
+
+        for artifact in self.manifest.artifacts():
+            if "_metrics_" in artifact and not artifact.endswith(f"_metrics_{key}"):
+                self.manifest.remove(artifact)
+
+    def get_data_with_metrics(self, possessions, passing_options, pe):
+        """Get the computed metrics and players cube for all matches"""
+
+        # the xthreat threshold is shared by all matches
+        pe.init_xthreat_threshold(pe.select_possessions(possessions))
+
+        possessions_by_match = dict(tuple(possessions.groupby('match_id')))
+
+        shards = self.map_matches(
+            lambda match_id: self.load_match_metrics(
+                match_id, possessions_by_match.get(match_id, possessions.iloc[0:0]), passing_options, pe),
+            "Computing metrics")
+
+        # cube rows refer to possessions of their match, offset them to the whole table
+        offsets = np.cumsum([0] + [len(metrics) for metrics, _ in shards[:-1]])
+        cubes = [cube.assign(first_row=cube['first_row'] + offset)
+                 for (_, cube), offset in zip(shards, offsets)]
+
+        all_metrics = apply_dtypes(pd.concat(
+            [metrics for metrics, _ in shards], ignore_index=True))
+
+        if self.cache:
+            self.prune_metrics(pe.thresholds_key())
 
-        return all_events, all_pass_possessions
+        return all_metrics, apply_dtypes(pd.concat(cubes, ignore_index=True))
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class DataSource(ABC):
+    """Access to the files of the SkillCorner opendata repository layout"""
+
+    def match_path(self, match_id, suffix):
+        """Get the path of a match file relative to the repository root"""
+        return f"data/matches/{match_id}/{match_id}_{suffix}"
+
+    def events_path(self, match_id):
+        """Get the path of the dynamic events of a match"""
+        return self.match_path(match_id, "dynamic_events.csv")
+
+    def metadata_path(self, match_id):
+        """Get the path of the metadata of a match"""
+        return self.match_path(match_id, "match.json")
+
+    def tracking_path(self, match_id):
+        """Get the path of the extrapolated tracking of a match"""
+        return self.match_path(match_id, "tracking_extrapolated.jsonl")
+
+    @abstractmethod
+    def location(self, path):
+        """Get where a file is read from, used to identify cached artifacts"""
+
+    @abstractmethod
+    def validator(self, path):
+        """Get a cheap token changing with the content of a file, None when it cannot be checked"""
+
+    @abstractmethod
+    def read_bytes(self, path):
+        """Read a whole file"""
+
+    @abstractmethod
+    def iter_lines(self, path):
+        """Read a file line by line"""
+
+
+class LocalDataSource(DataSource):
+    """Files from a local clone of the SkillCorner opendata repository"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def location(self, path):
+        return str(self.root / path)
+
+    def validator(self, path):
+        try:
+            stat = (self.root / path).stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def read_bytes(self, path):
+        return (self.root / path).read_bytes()
+
+    def iter_lines(self, path):
+        with open(self.root / path, "rb") as f:
+            for line in f:
+                yield line.rstrip(b"\r\n")
+
+
+class HttpDataSource(DataSource):
+    """Files from GitHub over a pooled session with conditional requests"""
+
+    raw_url = "https://raw.githubusercontent.com/SkillCorner/opendata/refs/heads/master/"
+    # tracking files are stored with git LFS
+    media_url = "https://media.githubusercontent.com/media/SkillCorner/opendata/refs/heads/master/"
+
+    def __init__(self, cache_dir=None, pool_size=10, timeout=60):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=3, backoff_factor=0.5,
+                              status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def location(self, path):
+        base_url = self.media_url if path.endswith(".jsonl") else self.raw_url
+        return f"{base_url}{path}"
+
+    def validator(self, path):
+        # the branch head moves, the ETag follows the content of the file
+        try:
+            response = self.session.head(self.location(path), allow_redirects=True, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        return response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+    def validators_path(self, url):
+        """Get the files keeping the validators and body of a response"""
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return f"{self.cache_dir}/{key}.json", f"{self.cache_dir}/{key}.body"
+
+    def read_bytes(self, path):
+        url = self.location(path)
+
+        headers = {}
+        validators = {}
+        if self.cache_dir is not None:
+            validators_path, body_path = self.validators_path(url)
+            if os.path.exists(validators_path) and os.path.exists(body_path):
+                with open(validators_path) as f:
+                    validators = json.load(f)
+
+                if 'etag' in validators:
+                    headers['If-None-Match'] = validators['etag']
+                if 'last_modified' in validators:
+                    headers['If-Modified-Since'] = validators['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        # not modified since the stored response
+        if response.status_code == 304 and validators:
+            with open(body_path, "rb") as f:
+                return f.read()
+
+        response.raise_for_status()
+
+        if self.cache_dir is not None:
+            validators = {}
+            if 'ETag' in response.headers:
+                validators['etag'] = response.headers['ETag']
+            if 'Last-Modified' in response.headers:
+                validators['last_modified'] = response.headers['Last-Modified']
+
+            if validators:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(body_path, "wb") as f:
+                    f.write(response.content)
+                with open(validators_path, "w") as f:
+                    json.dump(validators, f)
+
+        return response.content
+
+    def iter_lines(self, path):
+        with self.session.get(self.location(path), stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            yield from response.iter_lines()
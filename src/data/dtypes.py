@@ -0,0 +1,87 @@
+import pandas as pd
+
+from src.utils.log import log_message
+
+# compact dtypes applied at ingestion, columns missing from a frame are skipped
+# xthreat and xpass values stay float64 so the metrics are unchanged
+DTYPES = {
+    # repeated labels of events and possessions
+    'event_type': 'category',
+    'event_subtype': 'category',
+    'player_name': 'category',
+    'player_position': 'category',
+    'position_category': 'category',
+    'team_shortname': 'category',
+    'channel_start': 'category',
+    'third_start': 'category',
+    'third_end': 'category',
+    'game_state': 'category',
+    'team_in_possession_phase_type': 'category',
+    'team_out_of_possession_phase_type': 'category',
+    'start_type': 'category',
+    'end_type': 'category',
+    'pass_outcome': 'category',
+    'pass_range': 'category',
+    'associated_off_ball_run_subtype': 'category',
+
+    # repeated labels of players and tracking
+    'match_name': 'category',
+    'match_date_time': 'category',
+    'match_home_team.name': 'category',
+    'match_away_team.name': 'category',
+    'short_name': 'category',
+    'team_name': 'category',
+    'player_role.position_group': 'category',
+    'player_role.name': 'category',
+    'player_role.acronym': 'category',
+    'direction_player_1st_half': 'category',
+    'direction_player_2nd_half': 'category',
+    'possession_group': 'category',
+
+    # frames, clock and scores
+    'frame': 'int32',
+    'frame_start': 'int32',
+    'frame_end': 'int32',
+    'period': 'int8',
+    'minute_start': 'int16',
+    'team_score': 'int8',
+    'opponent_team_score': 'int8',
+
+    # coordinates
+    'x_start': 'float32',
+    'y_start': 'float32',
+    'x_end': 'float32',
+    'y_end': 'float32',
+    'x': 'float32',
+    'y': 'float32',
+    'ball_x': 'float32',
+    'ball_y': 'float32',
+    'ball_z': 'float32',
+}
+
+
+def apply_dtypes(df, label=None):
+    """Cast the columns of df to their compact dtype, logging the memory saved under label"""
+
+    dtypes = {}
+    for column, dtype in DTYPES.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+
+        # integers cannot hold missing values, keep those columns as they are
+        if dtype != 'category' and pd.api.types.is_integer_dtype(dtype) and df[column].isna().any():
+            continue
+
+        dtypes[column] = dtype
+
+    if not dtypes:
+        return df
+
+    compact_df = df.astype(dtypes)
+
+    if label is not None:
+        before = df.memory_usage(deep=True).sum() / 1e6
+        after = compact_df.memory_usage(deep=True).sum() / 1e6
+        log_message(f"Compacted {label}: {before:.2f} MB -> {after:.2f} MB")
+
+    return compact_df
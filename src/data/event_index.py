@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+class EventIndex:
+    """Sorted packed (match_id, event_id) keys with the rows of a table they are found at"""
+
+    def __init__(self, match_ids, event_ids):
+        # factorized ids make the keys independent of the event_id dtype
+        match_codes, self.match_ids = pd.factorize(np.asarray(match_ids), sort=True)
+        event_codes, self.event_ids = pd.factorize(np.asarray(event_ids), sort=True)
+
+        # rows without an id cannot be looked up
+        rows = np.flatnonzero((match_codes >= 0) & (event_codes >= 0))
+        keys = self.pack(match_codes[rows], event_codes[rows])
+
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.order = rows[order]
+
+    def pack(self, match_codes, event_codes):
+        """Pack match and event codes into a single int64 key"""
+        return match_codes.astype(np.int64) * (len(self.event_ids) + 1) + event_codes
+
+    def codes(self, uniques, values):
+        """Get the codes of values in the sorted uniques, -1 when missing"""
+        if not len(uniques):
+            return np.full(len(values), -1, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(uniques, values), len(uniques) - 1)
+        return np.where(uniques[positions] == values, positions, -1)
+
+    def ranges(self, match_ids, event_ids):
+        """Get the (left, right) positions in order of every key, empty when missing"""
+
+        match_codes = self.codes(self.match_ids, np.asarray(match_ids))
+        event_codes = self.codes(self.event_ids, np.asarray(event_ids))
+        keys = self.pack(match_codes, event_codes)
+
+        left = np.searchsorted(self.keys, keys, side='left')
+        right = np.searchsorted(self.keys, keys, side='right')
+
+        missing = (match_codes < 0) | (event_codes < 0)
+        right[missing] = left[missing]
+
+        return left, right
+
+    def rows(self, match_id, event_id):
+        """Get the table rows of a single key"""
+        left, right = self.ranges([match_id], [event_id])
+        return self.order[left[0]:right[0]]
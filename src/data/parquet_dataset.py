@@ -0,0 +1,49 @@
+import os
+import shutil
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ParquetDataset:
+    """Parquet dataset partitioned by match_id, read with column projection"""
+
+    def __init__(self, path, compression='zstd', row_group_size=64_000):
+        self.path = path
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def partition_path(self, match_id):
+        """Get the directory of the partition of a match"""
+        # match_id is kept in the files, a hive style name would add it a second time when read as a dataset
+        return f"{self.path}/{match_id}"
+
+    def file_path(self, match_id):
+        return f"{self.partition_path(match_id)}/part-0.parquet"
+
+    def write_partition(self, match_id, df):
+        """Write the rows of a match, replacing its partition"""
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        # write next to the target and swap it in so readers never see a partial file
+        partition_path = self.partition_path(match_id)
+        tmp_path = f"{partition_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        pq.write_table(table, f"{tmp_path}/part-0.parquet",
+                       compression=self.compression, row_group_size=self.row_group_size)
+
+        shutil.rmtree(partition_path, ignore_errors=True)
+        try:
+            os.replace(tmp_path, partition_path)
+        except OSError:
+            # another worker swapped in the same data meanwhile
+            if not os.path.isdir(partition_path):
+                raise
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def read_partition(self, match_id, columns=None):
+        """Read the rows of a match, only with the given columns"""
+        return pq.read_table(self.file_path(match_id), columns=columns).to_pandas()
@@ -1,3 +1,5 @@
+import hashlib
+
 import numpy as np
 import pandas as pd
 
@@ -63,6 +65,16 @@ metric_labels = {
 }
 
 
+def segment_reduce(ufunc, values, offsets, initial):
+    """Reduce values over the segments delimited by offsets"""
+    counts = np.diff(offsets)
+    result = np.full(len(counts), initial, dtype=np.result_type(values, initial))
+    non_empty = counts > 0
+    if len(values):
+        result[non_empty] = ufunc.reduceat(values, offsets[:-1][non_empty])
+    return result
+
+
 class PassingEvaluation:
     columns = [
         'event_id',
@@ -112,10 +124,17 @@ class PassingEvaluation:
         'n_passing_options',
         'n_off_ball_runs',
         'pass_range',
-        'passing_options',
         'position_category'
     ]
 
+    cube_dimensions = [
+        'third_start',
+        'third_end',
+        'period',
+        'game_state',
+        'team_in_possession_phase_type',
+    ]
+
     def __init__(self, xpass_threshold=None, xthreat_threshold=None):
         self.good_xpass_threshold = xpass_threshold if xpass_threshold is not None else .8
         self.good_xthreat_threshold = xthreat_threshold
@@ -128,12 +147,22 @@ class PassingEvaluation:
             self.good_xthreat_threshold = df['player_targeted_xthreat'].describe()[
                 '75%']
 
-    def compute_metrics(self, data):
-        """Compute metrics for passing options"""
+    def thresholds_key(self):
+        """Get a short key identifying the thresholds"""
+        thresholds = (self.good_xpass_threshold, self.good_xthreat_threshold,
+                      self.realistic_xthreat_threshold)
+        return hashlib.md5(repr(thresholds).encode()).hexdigest()[:8]
+
+    def select_possessions(self, data):
+        """Keep the possessions the metrics are computed for"""
         # only keep situations with n_passing_options > 1 and with an player_targeted_xthreat
-        df = data[(data['n_passing_options'] > 1) & (
+        return data[(data['n_passing_options'] > 1) & (
             data['player_targeted_xthreat'].notna())][self.columns]
 
+    def compute_metrics(self, data, passing_options):
+        """Compute metrics for passing options"""
+        df = self.select_possessions(data)
+
         self.init_xthreat_threshold(df)
 
         log_message(
@@ -144,194 +173,185 @@ class PassingEvaluation:
             df['player_targeted_xpass_completion']
 
         # process passing options
-        options_results = df.apply(self.process_passing_options, axis=1)
-
-        df['safest_pass'] = options_results.apply(lambda x: x['safest_pass'])
-        df['highest_xthreat_pass'] = options_results.apply(
-            lambda x: x['highest_xthreat_pass'])
-        df['has_good_pass_opportunities'] = options_results.apply(
-            lambda x: x['has_good_pass_opportunities'])
-        df['good_pass_opportunity'] = options_results.apply(
-            lambda x: x['good_pass_opportunity'])
+        options_results = self.process_passing_options(
+            df, passing_options)
 
-        df['missed_good_pass_opportunity'] = options_results.apply(
-            lambda x: x['missed_good_pass_opportunity'])
-
-        df['xthreat_available'] = options_results.apply(
-            lambda x: x['xthreat_available'])
-
-        df['missed_xthreat'] = options_results.apply(
-            lambda x: x['missed_xthreat'])
+        for column in ['safest_pass', 'highest_xthreat_pass', 'has_good_pass_opportunities',
+                       'good_pass_opportunity', 'missed_good_pass_opportunity',
+                       'xthreat_available', 'missed_xthreat']:
+            df[column] = options_results[column]
 
         df['decision_efficiency'] = (
             df['player_targeted_xthreat'] / df['xthreat_available']) * 100
 
-        df['x_xthreat_best'] = options_results.apply(
-            lambda x: x['x_xthreat_best'])
-        df['x_xthreat_avg'] = options_results.apply(
-            lambda x: x['x_xthreat_avg'])
-
-        df['better_x_xthreats_count'] = options_results.apply(
-            lambda x: x['better_x_xthreats_count'])
-
-        df['options_count'] = options_results.apply(
-            lambda x: x['options_count'])
+        for column in ['x_xthreat_best', 'x_xthreat_avg',
+                       'better_x_xthreats_count', 'options_count']:
+            df[column] = options_results[column]
 
         return df
 
     def is_good_pass_opportunity(self, xpass, xthreat):
         """Check if passing option is good opportunity"""
-        return xpass >= self.good_xpass_threshold and xthreat >= self.good_xthreat_threshold
+        return (xpass >= self.good_xpass_threshold) & (xthreat >= self.good_xthreat_threshold)
 
-    def xthreat_available(self, options):
+    def xthreat_available(self, xthreat, xpass, offsets):
         """Calculate the maximum xThreat among realistic options"""
-        realistic_options = [
-            opt['xthreat']
-            for opt in options
-            if opt['xpass_completion'] >= self.realistic_xthreat_threshold
-        ]
-        return max(realistic_options) if realistic_options else 0.0
+        realistic = np.where(
+            xpass >= self.realistic_xthreat_threshold, xthreat, -np.inf)
+        best = segment_reduce(np.maximum, realistic, offsets, -np.inf)
+        return np.where(np.isneginf(best), 0.0, best)
 
-    def process_passing_options(self, row):
-        """Compare passing options"""
+    def process_passing_options(self, df, passing_options):
+        """Compare passing options of all possessions at once"""
 
-        options_data = row['passing_options']
-        if not len(options_data):
-            return
+        xthreat, offsets = passing_options.take(df, 'xthreat')
+        xpass, _ = passing_options.take(df, 'xpass_completion')
+        counts = np.diff(offsets)
 
-        player_targeted_x_xthreat = row['player_targeted_x_xthreat']
-        player_targeted_xthreat = row['player_targeted_xthreat']
-        player_targeted_xpass_completion = row['player_targeted_xpass_completion']
+        player_targeted_x_xthreat = df['player_targeted_x_xthreat'].to_numpy(
+            dtype=np.float64)
+        player_targeted_xthreat = df['player_targeted_xthreat'].to_numpy(
+            dtype=np.float64)
+        player_targeted_xpass_completion = df['player_targeted_xpass_completion'].to_numpy(
+            dtype=np.float64)
 
         # check if targeted is highest xthreat or completion
-        higher_xpass_completion = False
-        higher_xthreat = False
-        has_good_pass_opportunities = False
-
-        for o in options_data:
-            if o['xpass_completion'] > player_targeted_xpass_completion:
-                higher_xpass_completion = True
-
-            if o['xthreat'] > player_targeted_xthreat:
-                higher_xthreat = True
-
-            if self.is_good_pass_opportunity(o['xpass_completion'], o['xthreat']):
-                has_good_pass_opportunities = True
+        higher_xpass_completion = segment_reduce(
+            np.logical_or, xpass > np.repeat(player_targeted_xpass_completion, counts), offsets, False)
+        higher_xthreat = segment_reduce(
+            np.logical_or, xthreat > np.repeat(player_targeted_xthreat, counts), offsets, False)
+        has_good_pass_opportunities = segment_reduce(
+            np.logical_or, self.is_good_pass_opportunity(xpass, xthreat), offsets, False)
 
         targeted_is_good_pass_opportunity = self.is_good_pass_opportunity(
-            row['player_targeted_xpass_completion'], row['player_targeted_xthreat'])
+            player_targeted_xpass_completion, player_targeted_xthreat)
 
         # get best and average xthreat
-        xthreat_available = self.xthreat_available(options_data)
+        xthreat_available = self.xthreat_available(xthreat, xpass, offsets)
+        targeted_is_lower = player_targeted_xthreat < xthreat_available
 
-        # calculate x_xthreat for each pass
-        x_xthreats = [opt['xthreat'] * opt['xpass_completion']
-                      for opt in options_data]
-        x_xthreats_sorted = sorted(x_xthreats, reverse=True)
-        x_xthreat_best = x_xthreats_sorted[0]
-        x_xthreat_avg = np.mean(x_xthreats_sorted)
+        # calculate x_xthreat for each pass, the averages are summed sequentially
+        # so they can differ from np.mean in the last bits
+        x_xthreats = xthreat * xpass
+        x_xthreat_best = segment_reduce(
+            np.maximum, x_xthreats, offsets, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x_xthreat_avg = segment_reduce(
+                np.add, x_xthreats, offsets, 0.0) / counts
 
-        better_x_xthreats_count = sum(
-            1 if x > player_targeted_x_xthreat else 0 for x in x_xthreats)
+        better_x_xthreats_count = segment_reduce(
+            np.add, (x_xthreats > np.repeat(player_targeted_x_xthreat, counts)).astype(np.int64), offsets, 0)
 
         return {
-            'safest_pass': 0 if higher_xpass_completion else 1,
-            'highest_xthreat_pass': 0 if higher_xthreat else 1,
+            'safest_pass': np.where(higher_xpass_completion, 0, 1),
+            'highest_xthreat_pass': np.where(higher_xthreat, 0, 1),
 
-            'has_good_pass_opportunities': 1 if has_good_pass_opportunities else 0,
-            'good_pass_opportunity': 1 if targeted_is_good_pass_opportunity else 0,
-            'missed_good_pass_opportunity': 1 if not targeted_is_good_pass_opportunity and has_good_pass_opportunities else 0,
+            'has_good_pass_opportunities': np.where(has_good_pass_opportunities, 1, 0),
+            'good_pass_opportunity': np.where(targeted_is_good_pass_opportunity, 1, 0),
+            'missed_good_pass_opportunity': np.where(~targeted_is_good_pass_opportunity & has_good_pass_opportunities, 1, 0),
 
-            'xthreat_available': xthreat_available if player_targeted_xthreat < xthreat_available else player_targeted_xthreat,
-            'missed_xthreat': (xthreat_available - player_targeted_xthreat) if player_targeted_xthreat < xthreat_available else 0,
+            'xthreat_available': np.where(targeted_is_lower, xthreat_available, player_targeted_xthreat),
+            'missed_xthreat': np.where(targeted_is_lower, xthreat_available - player_targeted_xthreat, 0),
 
             'x_xthreat_best': x_xthreat_best,
             'x_xthreat_avg': x_xthreat_avg,
 
-            'options_count': len(options_data),
+            'options_count': counts,
 
             'better_x_xthreats_count': better_x_xthreats_count,
         }
 
+    def possession_measures(self, df):
+        """Get the additive measures of each possession used by the player aggregates"""
+
+        completed = (df['pass_outcome'] == 'successful').astype(int)
+        safest_pass = df['safest_pass']
+        highest_xthreat_pass = df['highest_xthreat_pass']
+        has_good_pass_opportunities = df['has_good_pass_opportunities']
+        good_pass_opportunity = df['good_pass_opportunity']
+
+        measures = pd.DataFrame({
+            'rows': np.ones(len(df), dtype=np.int64),
+            'safest_pass': safest_pass,
+            'highest_xthreat_pass': highest_xthreat_pass,
+            'has_good_pass_opportunities': has_good_pass_opportunities,
+            # good and missed opportunities are only counted when one was available
+            'good_pass_opportunity': good_pass_opportunity * (has_good_pass_opportunities == 1),
+            'missed_good_pass_opportunity': df['missed_good_pass_opportunity'] * (has_good_pass_opportunities == 1),
+            'completed': completed,
+            'completed_safest_pass': (completed & safest_pass) * (safest_pass == 1),
+            'completed_highest_xthreat_pass': (completed & highest_xthreat_pass) * (highest_xthreat_pass == 1),
+            'completed_good_pass_opportunity': (completed & good_pass_opportunity) * (good_pass_opportunity == 1),
+            'good_pass_opportunity_count': (good_pass_opportunity == 1).astype(int),
+            'event_id_count': df['event_id'].notna().astype(int),
+        }, index=df.index)
+
+        # sums and non null counts for the averages
+        for column in ['player_targeted_xthreat', 'xthreat_available', 'missed_xthreat', 'decision_efficiency']:
+            measures[f"{column}_sum"] = df[column].fillna(0)
+            measures[f"{column}_count"] = df[column].notna().astype(int)
+
+        return measures
+
+    def aggregate_players(self, sums, attributes):
+        """Derive the player metrics from the summed possession measures"""
+
+        def rate(numerator, denominator):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(denominator > 0, numerator / denominator * 100, 0)
+
+        def mean(column):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return sums[f"{column}_sum"] / sums[f"{column}_count"]
+
+        players_agg = pd.DataFrame({
+            'safest_pass_perc': sums['safest_pass'] / sums['rows'] * 100,
+            'safest_pass_sum': sums['safest_pass'],
+            'highest_xthreat_pass_perc': sums['highest_xthreat_pass'] / sums['rows'] * 100,
+            'highest_xthreat_pass_sum': sums['highest_xthreat_pass'],
+            'has_good_pass_opportunities_perc': sums['has_good_pass_opportunities'] / sums['rows'] * 100,
+            'has_good_pass_opportunities_sum': sums['has_good_pass_opportunities'],
+            'good_pass_opportunity_perc': rate(sums['good_pass_opportunity'], sums['has_good_pass_opportunities']),
+            'good_pass_opportunity_sum': sums['good_pass_opportunity'],
+            'missed_good_pass_opportunity_perc': rate(sums['missed_good_pass_opportunity'], sums['has_good_pass_opportunities']),
+            'missed_good_pass_opportunity_sum': sums['missed_good_pass_opportunity'],
+            'completed_perc': sums['completed'] / sums['rows'] * 100,
+            'completed_sum': sums['completed'],
+            'completed_safest_pass_perc': rate(sums['completed_safest_pass'], sums['safest_pass']),
+            'completed_safest_pass_sum': sums['completed_safest_pass'],
+            'completed_highest_xthreat_pass_perc': rate(sums['completed_highest_xthreat_pass'], sums['highest_xthreat_pass']),
+            'completed_highest_xthreat_pass_sum': sums['completed_highest_xthreat_pass'],
+            'completed_good_pass_opportunity_perc': rate(sums['completed_good_pass_opportunity'], sums['good_pass_opportunity_count']),
+            'completed_good_pass_opportunity_sum': sums['completed_good_pass_opportunity'],
+            'player_targeted_xthreat_sum': sums['player_targeted_xthreat_sum'],
+            'player_targeted_xthreat_mean': mean('player_targeted_xthreat'),
+            'xthreat_available_sum': sums['xthreat_available_sum'],
+            'xthreat_available_mean': mean('xthreat_available'),
+            'missed_xthreat_sum': sums['missed_xthreat_sum'],
+            'missed_xthreat_mean': mean('missed_xthreat'),
+            'decision_efficiency_mean': mean('decision_efficiency'),
+            'event_id_count': sums['event_id_count'],
+        }, index=sums.index)
+
+        # one row per player, plain labels are cheap here and what the charts expect
+        players_agg[['player_position', 'position_category', 'team_shortname']] = attributes[[
+            'player_position', 'position_category', 'team_shortname']].astype(object)
+
+        return players_agg.round(3).rename_axis('player_id').reset_index()
+
     def group_by_players(self, df, minutes):
         """Group data by players"""
 
-        df['completed'] = (df['pass_outcome'] == 'successful').astype(int)
-        df['completed_safest_pass'] = (df['completed'] & df['safest_pass'])
-        df['completed_highest_xthreat_pass'] = (
-            df['completed'] & df['highest_xthreat_pass'])
-        df['completed_good_pass_opportunity'] = (
-            df['completed'] & df['good_pass_opportunity'])
-
-        def subset_completion_rate(condition_col):
-            def aggregator(x):
-                subset = df.loc[x.index][df.loc[x.index]
-                                         [condition_col] == 1][x.name]
-                return (subset.sum() / subset.count() * 100) if subset.count() > 0 else 0
-            return aggregator
-
-        def subset_sum(condition_col):
-            def aggregator(x):
-                subset = df.loc[x.index][df.loc[x.index]
-                                         [condition_col] == 1][x.name]
-                return subset.sum()
-            return aggregator
-
-        players_agg = df.groupby('player_id').agg({
-            'safest_pass': [lambda x: (x.sum() / len(x)) * 100, 'sum'],
-            'highest_xthreat_pass': [lambda x: (x.sum() / len(x)) * 100, 'sum'],
-            'has_good_pass_opportunities': [lambda x: (x.sum() / len(x)) * 100, 'sum'],
-            'good_pass_opportunity': [subset_completion_rate('has_good_pass_opportunities'), subset_sum('has_good_pass_opportunities')],
-            'missed_good_pass_opportunity': [subset_completion_rate('has_good_pass_opportunities'), subset_sum('has_good_pass_opportunities')],
-            'completed': [lambda x: (x.sum() / len(x)) * 100, 'sum'],
-            'completed_safest_pass': [subset_completion_rate('safest_pass'), subset_sum('safest_pass')],
-            'completed_highest_xthreat_pass': [subset_completion_rate('highest_xthreat_pass'), subset_sum('highest_xthreat_pass')],
-            'completed_good_pass_opportunity': [subset_completion_rate('good_pass_opportunity'), subset_sum('good_pass_opportunity')],
-            'player_targeted_xthreat': ['sum', 'mean'],
-            'xthreat_available': ['sum', 'mean'],
-            'missed_xthreat': ['sum', 'mean'],
-            'decision_efficiency': ['mean'],
-            'event_id': 'count',
-            'player_position': 'first',
-            'position_category': 'first',
-            'team_shortname': 'first'
-        }).round(3).reset_index()
-
-        players_agg.columns = ['_'.join(col).strip(
-            '_') for col in players_agg.columns.values]
-
-        players_agg.columns = [
-            'player_id',
-            'safest_pass_perc',
-            'safest_pass_sum',
-            'highest_xthreat_pass_perc',
-            'highest_xthreat_pass_sum',
-            'has_good_pass_opportunities_perc',
-            'has_good_pass_opportunities_sum',
-            'good_pass_opportunity_perc',
-            'good_pass_opportunity_sum',
-            'missed_good_pass_opportunity_perc',
-            'missed_good_pass_opportunity_sum',
-            'completed_perc',
-            'completed_sum',
-            'completed_safest_pass_perc',
-            'completed_safest_pass_sum',
-            'completed_highest_xthreat_pass_perc',
-            'completed_highest_xthreat_pass_sum',
-            'completed_good_pass_opportunity_perc',
-            'completed_good_pass_opportunity_sum',
-            'player_targeted_xthreat_sum',
-            'player_targeted_xthreat_mean',
-            'xthreat_available_sum',
-            'xthreat_available_mean',
-            'missed_xthreat_sum',
-            'missed_xthreat_mean',
-            'decision_efficiency_mean',
-            'event_id_count',
-            'player_position',
-            'position_category',
-            'team_shortname'
-        ]
+        sums = self.possession_measures(df).groupby(df['player_id']).sum()
+        attributes = df.groupby('player_id')[
+            ['player_position', 'position_category', 'team_shortname']].first()
+
+        players_agg = self.aggregate_players(sums, attributes)
+
+        return self.per_90(players_agg, minutes)
+
+    def per_90(self, players_agg, minutes):
+        """Add playing time and per 90 metrics to aggregated player data"""
 
         df_merged = players_agg.merge(
             minutes[['id', "short_name", 'playing_time.total.minutes_played',
@@ -354,6 +374,41 @@ class PassingEvaluation:
 
         return df_merged
 
+    def build_cube(self, df):
+        """Precompute the player measures for every combination of the filter dimensions"""
+
+        measures = self.possession_measures(df)
+        measures['first_row'] = np.arange(len(df))
+
+        keys = ['player_id'] + self.cube_dimensions
+        cube = measures.groupby([df[key] for key in keys], dropna=False, observed=True).agg(
+            {**{column: 'sum' for column in measures.columns}, 'first_row': 'min'}).reset_index()
+
+        # keep the attributes of the first possession of each cell
+        attributes = df[['player_position', 'position_category',
+                         'team_shortname']].iloc[cube['first_row']]
+        cube[attributes.columns] = attributes.to_numpy()
+
+        return cube
+
+    def group_cube_by_players(self, cube, minutes, third="All", **filters):
+        """Group the cube cells matching the filters by players"""
+
+        selected = self.third_filter(cube, third)
+        for dimension, values in filters.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            selected = selected[selected[dimension].isin(values)]
+
+        measures = selected.drop(columns=self.cube_dimensions + [
+            'player_position', 'position_category', 'team_shortname'])
+
+        sums = measures.groupby('player_id').sum()
+        attributes = selected.loc[selected.groupby('player_id')['first_row'].idxmin()].set_index('player_id')
+
+        players_agg = self.aggregate_players(sums, attributes)
+
+        return self.per_90(players_agg, minutes)
+
     def get_metrics(self, df):
         """Calculate league-wide metrics from aggregated player data"""
         metrics = {
@@ -378,20 +433,19 @@ class PassingEvaluation:
         time_labels = ['0-15', '15-30', '30-45',
                        '45-60', '60-75', '75-90+']
 
-        # Add time bin column to dataframe
-        df_with_bins = df.copy()
-        df_with_bins['time_bin'] = pd.cut(
-            df_with_bins['minute_start'],
+        # Add time bin column to a new frame, df is left untouched
+        df_with_bins = df.assign(time_bin=pd.cut(
+            df['minute_start'],
             bins=time_bins,
             labels=time_labels,
             include_lowest=True
-        )
+        ))
 
         return df_with_bins
 
     def third_filter(self, df, third):
         """Filter by third part of the pitch"""
-        filtered = df.copy()
+        filtered = df
 
         if third != "All":
             third = f"{third.lower()}_third"
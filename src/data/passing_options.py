@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from src.data.event_index import EventIndex
+
+
+class PassingOptions:
+    """Long-format passing options, one row per option keyed by possession"""
+
+    key_columns = ['match_id', 'event_id']
+    columns = [
+        'player_id',
+        'xthreat',
+        'xpass_completion',
+        'passing_option_score',
+        'associated_off_ball_run_subtype',
+        'pass_range',
+    ]
+
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+
+        # the options of a possession are contiguous rows of the table
+        self.index = EventIndex(self.table['match_id'], self.table['event_id'])
+
+    @classmethod
+    def from_events(cls, all_events):
+        """Build the options table from the dynamic events"""
+
+        pass_options = all_events[all_events['event_type'] == 'passing_option'].dropna(
+            subset=['associated_player_possession_event_id'])
+
+        table = pd.DataFrame({
+            'match_id': pass_options['match_id'],
+            'event_id': pass_options['associated_player_possession_event_id'].astype(
+                all_events['event_id'].dtype),
+        })
+        table[cls.columns] = pass_options[cls.columns]
+
+        # keep options of the same possession contiguous
+        table = table.sort_values(cls.key_columns, kind='stable')
+
+        return cls(table)
+
+    def segments(self, possessions):
+        """Get the options row ranges for each possession"""
+
+        left, right = self.index.ranges(
+            possessions['match_id'], possessions['event_id'])
+
+        starts = np.zeros(len(left), dtype=np.int64)
+        found = right > left
+        starts[found] = self.index.order[left[found]]
+
+        return starts, starts + (right - left)
+
+    def take(self, possessions, column):
+        """Get the flat option values of possessions with per-possession offsets"""
+
+        starts, stops = self.segments(possessions)
+        counts = stops - starts
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        values = self.table[column].to_numpy()
+
+        # possessions laid out like the table are read as a single slice
+        if len(counts) and (counts > 0).all() and (starts[1:] == stops[:-1]).all():
+            return values[starts[0]:stops[-1]], offsets
+
+        rows = np.repeat(starts - offsets[:-1], counts) + \
+            np.arange(offsets[-1])
+
+        return values[rows], offsets
+
+    def get(self, match_id, event_id):
+        """Get the options of a single possession"""
+
+        return self.table.iloc[self.index.rows(match_id, event_id)]
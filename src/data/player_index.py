@@ -0,0 +1,22 @@
+import numpy as np
+
+
+class PlayerIndex:
+    """Rows range of every player of a table sorted by player_id"""
+
+    def __init__(self, player_ids):
+        self.player_ids, starts, counts = np.unique(
+            np.asarray(player_ids), return_index=True, return_counts=True)
+        self.starts = starts
+        self.stops = starts + counts
+
+    def rows(self, player_id):
+        """Get the rows slice of a player, empty when missing"""
+        position = int(np.searchsorted(self.player_ids, player_id))
+        if position < len(self.player_ids) and self.player_ids[position] == player_id:
+            return slice(int(self.starts[position]), int(self.stops[position]))
+        return slice(0, 0)
+
+    def take(self, df, player_id):
+        """Get the rows of a player from the indexed table"""
+        return df.iloc[self.rows(player_id)]
@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnBuffer:
+    """Growable typed column filled in chunks"""
+
+    def __init__(self, dtype, capacity=1 << 16):
+        self.values = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        """Append a chunk of values"""
+        size = self.size + len(values)
+        if size > len(self.values):
+            self.values.resize(
+                max(size, int(len(self.values) * 1.5)), refcheck=False)
+        self.values[self.size:size] = values
+        self.size = size
+
+    def to_numpy(self):
+        """Shrink the buffer to its values and return them"""
+        self.values.resize(self.size, refcheck=False)
+        return self.values
+
+
+# one value per player per frame
+PLAYER_COLUMNS = {
+    'x': np.float64,
+    'y': np.float64,
+    'player_id': np.int64,
+    'is_detected': bool,
+}
+
+# one value per frame
+FRAME_COLUMNS = {
+    'frame': np.int64,
+    'timestamp': object,
+    'period': np.float64,
+    'possession_player_id': np.float64,
+    'possession_group': object,
+    'ball_x': np.float64,
+    'ball_y': np.float64,
+    'ball_z': np.float64,
+    'is_detected_ball': bool,
+}
+
+
+def parse_tracking_lines(lines, chunk_size=2000):
+    """Parse tracking JSONL lines into a players per frame table and a frames table"""
+
+    buffers = {column: ColumnBuffer(dtype)
+               for column, dtype in {**PLAYER_COLUMNS, **FRAME_COLUMNS}.items()}
+    counts = ColumnBuffer(np.int64)
+
+    chunk = {column: [] for column in buffers}
+    chunk_counts = []
+
+    def flush():
+        for column, values in chunk.items():
+            dtype = buffers[column].values.dtype
+            buffers[column].extend(np.array(values, dtype=dtype))
+            values.clear()
+        counts.extend(np.array(chunk_counts, dtype=np.int64))
+        chunk_counts.clear()
+
+    for line in lines:
+        if not line:
+            continue
+
+        record = json.loads(line)
+        player_data = record.get('player_data')
+
+        # frames without players do not produce rows
+        if not player_data:
+            continue
+
+        for column in PLAYER_COLUMNS:
+            chunk[column].extend([p.get(column) for p in player_data])
+
+        possession = record.get('possession') or {}
+        ball_data = record.get('ball_data') or {}
+
+        chunk['frame'].append(record['frame'])
+        chunk['timestamp'].append(record.get('timestamp'))
+        chunk['period'].append(record.get('period'))
+        chunk['possession_player_id'].append(possession.get('player_id'))
+        chunk['possession_group'].append(possession.get('group'))
+        chunk['ball_x'].append(ball_data.get('x'))
+        chunk['ball_y'].append(ball_data.get('y'))
+        chunk['ball_z'].append(ball_data.get('z'))
+        chunk['is_detected_ball'].append(ball_data.get('is_detected'))
+        chunk_counts.append(len(player_data))
+
+        if len(chunk_counts) >= chunk_size:
+            flush()
+
+    flush()
+
+    frames_df = pd.DataFrame(
+        {column: buffers[column].to_numpy() for column in FRAME_COLUMNS}, copy=False)
+
+    if not frames_df['period'].isna().any():
+        frames_df['period'] = frames_df['period'].astype(np.int64)
+
+    # only the frame is repeated on the players rows, the rest is joined from frames_df
+    player_frames_df = pd.DataFrame({
+        'frame': np.repeat(frames_df['frame'].to_numpy(), counts.to_numpy()),
+        **{column: buffers[column].to_numpy() for column in PLAYER_COLUMNS},
+    }, copy=False)
+
+    return player_frames_df, frames_df
@@ -0,0 +1,124 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class TrackingStore:
+    """Frame indexed tracking arrays of a match, opened as memory maps"""
+
+    # frames per second of the skillcorner tracking
+    frame_rate = 10
+
+    # one row per player per frame, sorted by frame
+    player_columns = {
+        'player_id': np.int32,
+        'x': np.float32,
+        'y': np.float32,
+    }
+
+    # one row per frame with the rows range of its players
+    frame_columns = {
+        'frame': np.int32,
+        'start': np.int64,
+        'stop': np.int64,
+        'ball_x': np.float32,
+        'ball_y': np.float32,
+        'ball_z': np.float32,
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.players = {
+            column: np.load(f"{path}/{column}.npy", mmap_mode='r') for column in self.player_columns}
+        self.frames = {
+            column: np.load(f"{path}/{column}.npy", mmap_mode='r') for column in self.frame_columns}
+
+    @classmethod
+    def write(cls, path, player_frames_df, frames_df):
+        """Write the players per frame and frames tracking tables of a match to a store at path"""
+
+        player_frames_df = player_frames_df.sort_values('frame', kind='stable')
+
+        frames, starts, counts = np.unique(
+            player_frames_df['frame'].to_numpy(), return_index=True, return_counts=True)
+        ball = frames_df.drop_duplicates('frame').set_index('frame').reindex(frames)
+
+        arrays = {column: player_frames_df[column].to_numpy(dtype=dtype)
+                  for column, dtype in cls.player_columns.items()}
+        arrays.update({
+            'frame': frames.astype(np.int32),
+            'start': starts.astype(np.int64),
+            'stop': (starts + counts).astype(np.int64),
+            'ball_x': ball['ball_x'].to_numpy(dtype=np.float32),
+            'ball_y': ball['ball_y'].to_numpy(dtype=np.float32),
+            'ball_z': ball['ball_z'].to_numpy(dtype=np.float32),
+        })
+
+        # write next to the target and swap it in so readers never see a partial store
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column, values in arrays.items():
+            np.save(f"{tmp_path}/{column}.npy", values)
+
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # another worker swapped in the same data meanwhile
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def frame_position(self, frame):
+        """Get the position of a frame in the frame index or None"""
+        position = int(np.searchsorted(self.frames['frame'], frame))
+        if position < len(self.frames['frame']) and self.frames['frame'][position] == frame:
+            return position
+        return None
+
+    def frame(self, frame):
+        """Get the players and ball positions at a frame"""
+
+        position = self.frame_position(frame)
+        if position is None:
+            return pd.DataFrame(columns=['frame', *self.player_columns, 'ball_x', 'ball_y', 'ball_z'])
+
+        start = self.frames['start'][position]
+        stop = self.frames['stop'][position]
+
+        players = pd.DataFrame({column: np.asarray(values[start:stop])
+                                for column, values in self.players.items()})
+        players.insert(0, 'frame', frame)
+        for column in ['ball_x', 'ball_y', 'ball_z']:
+            players[column] = self.frames[column][position]
+
+        return players
+
+    def frame_range(self, frame_start, frame_end, step=1):
+        """Get the players and ball positions of every step-th frame between frame_start and frame_end"""
+
+        left = int(np.searchsorted(self.frames['frame'], frame_start, side='left'))
+        right = int(np.searchsorted(self.frames['frame'], frame_end, side='right'))
+        positions = np.arange(left, right, step)
+
+        # the last frame is always kept so the range ends on frame_end
+        if right > left and positions[-1] != right - 1:
+            positions = np.append(positions, right - 1)
+
+        # rows of the selected frames, contiguous per frame
+        starts = np.asarray(self.frames['start'][positions])
+        counts = np.asarray(self.frames['stop'][positions]) - starts
+        frame_positions = np.repeat(positions, counts)
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        players = pd.DataFrame({column: np.asarray(values[rows])
+                                for column, values in self.players.items()})
+        players.insert(0, 'frame', np.asarray(self.frames['frame'][frame_positions]))
+        for column in ['ball_x', 'ball_y', 'ball_z']:
+            players[column] = np.asarray(self.frames[column][frame_positions])
+
+        return players
@@ -2,7 +2,7 @@ import streamlit as st
 
 from src.data.data_loader import load_data_with_filter
 from src.data.passing_evaluation import PassingEvaluation, metric_labels
-from src.visualizations.charts import create_radar
+from src.visualizations.charts import render_radar
 from src.utils.helpers import check_player, get_metrics_df
 
 
@@ -71,9 +71,9 @@ else:
         filtered_stats = filtered_data['grouped_by_players']
 
         player1 = check_player(
-            filtered_stats[filtered_stats["player_id"] == player1_id], player1_id)
+            filtered_data['stats_by_player'].take(filtered_stats, player1_id), player1_id)
         player2 = check_player(
-            filtered_stats[filtered_stats["player_id"] == player2_id], player2_id)
+            filtered_data['stats_by_player'].take(filtered_stats, player2_id), player2_id)
 
         with st.spinner("Loading..."):
 
@@ -94,9 +94,8 @@ else:
                     "completed_good_pass_opportunity_perc",
                 ]
 
-                fig = create_radar(
-                    filtered_stats, radar_metrics, player1, player2)
-                st.pyplot(fig, width=800)
+                st.image(render_radar(
+                    filtered_stats, radar_metrics, player1, player2), width=800)
 
             with tab2:
                 basic_info = [
@@ -5,7 +5,7 @@ from src.data.data_loader import load_data_with_filter
 from src.data.passing_evaluation import PassingEvaluation, metric_labels
 
 from src.visualizations.charts import create_beeswarm, create_time_chart
-from src.visualizations.events import plot_event
+from src.visualizations.events import plot_event, plot_event_interactive, plot_playback
 
 
 # add the third filter to the sidebar
@@ -53,11 +53,11 @@ if selected_player_with_id is not None:
     all_players_stats = all_data['grouped_by_players']
     all_players_possessions = all_data['filtered_possessions']
 
-    selected_player_stats = all_players_stats[all_players_stats["player_id"]
-                                              == selected_player_id]
+    selected_player_stats = all_data['stats_by_player'].take(
+        all_players_stats, selected_player_id)
 
-    selected_player_possessions = all_players_possessions[all_players_possessions['player_id']
-                                                          == selected_player_id]
+    selected_player_possessions = all_data['possessions_by_player'].take(
+        all_players_possessions, selected_player_id)
 
     if not len(selected_player_stats):
         st.warning(f"No stats for Player {selected_player_with_id}")
@@ -276,7 +276,7 @@ if selected_player_with_id is not None:
                     all_players_possessions)
 
                 fig_time = create_time_chart(
-                    filtered_possessions_bins, selected_player_id)
+                    filtered_possessions_bins, selected_player_id, all_data['possessions_by_player'])
 
                 st.plotly_chart(fig_time)
 
@@ -352,22 +352,35 @@ if selected_player_with_id is not None:
                     selected_match_id = event['match_id']
                     selected_event_id = event['event_id']
 
-                    possession_event = selected_player_possessions[
-                        (selected_player_possessions["match_id"] == selected_match_id) &
-                        (selected_player_possessions["event_id"]
-                         == selected_event_id)
-                    ]
+                    possession_event = all_data['all_pass_possessions'].iloc[
+                        all_data['possessions_index'].rows(selected_match_id, selected_event_id)]
 
                     st.space()
 
                     st.subheader(f"Event {selected_event_id}")
 
+                    renderer = st.radio(
+                        "Pitch:",
+                        ["Image", "Interactive", "Playback"],
+                        index=0,
+                        horizontal=True,
+                        help="Interactive pitch is drawn by the browser with the passing options values on hover, "
+                             "playback animates the possession from its start to the pass",
+                    )
+
                     event_col1, event_col2 = st.columns([7, 3])
 
                     with event_col1:
                         with st.spinner("Loading..."):
-                            plot_event(possession_event,
-                                       all_data['all_events'])
+                            if renderer == "Interactive":
+                                plot_event_interactive(possession_event,
+                                                       all_data['passing_options'])
+                            elif renderer == "Playback":
+                                plot_playback(possession_event,
+                                              all_data['passing_options'])
+                            else:
+                                plot_event(possession_event,
+                                           all_data['passing_options'])
 
                     with event_col2:
                         st.subheader("Event Metrics")
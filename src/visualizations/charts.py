@@ -1,9 +1,13 @@
+import io
+
+import matplotlib.pyplot as plt
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
-from mplsoccer import Radar, FontManager, grid
+from mplsoccer import Radar, grid
 
 from src.data.passing_evaluation import metric_labels
+from src.visualizations.render_context import DPI, load_font
 
 line_color = "white" if st.context.theme.type == "dark" else "black"
 main_color = "#197BBD"
@@ -409,11 +413,16 @@ def create_beeswarm(metrics):
     return fig
 
 
-def create_time_chart(filtered_possessions_bins, selected_player_id):
+def create_time_chart(filtered_possessions_bins, selected_player_id, player_index=None):
     """Create time lines plot"""
 
-    player_metrics = filtered_possessions_bins[filtered_possessions_bins['player_id']
-                                               == selected_player_id]
+    # possessions sorted by player are sliced with their index
+    if player_index is not None:
+        player_metrics = player_index.take(
+            filtered_possessions_bins, selected_player_id)
+    else:
+        player_metrics = filtered_possessions_bins[filtered_possessions_bins['player_id']
+                                                   == selected_player_id]
 
     colors = {
         'global_avg': 'rgba(150, 150, 150, 0.8)',
@@ -561,7 +570,7 @@ def create_radar(filtered_stats, radar_metrics, player1, player2):
                     grid_height=0.915, title_height=0.06, endnote_height=0.025,
                     title_space=0, endnote_space=0, grid_key='radar', axis=False)
 
-    robotto_regular = FontManager()
+    robotto_regular = load_font()
 
     radar.setup_axis(ax=axs['radar'])
     rings_inner = radar.draw_circles(
@@ -572,24 +581,36 @@ def create_radar(filtered_stats, radar_metrics, player1, player2):
                                             kwargs_compare={'facecolor': secondary_color, 'alpha': 0.6})
     radar_poly, radar_poly2, vertices1, vertices2 = radar_output
     range_labels = radar.draw_range_labels(ax=axs['radar'], fontsize=15,
-                                           fontproperties=robotto_regular.prop)
+                                           fontproperties=robotto_regular)
     param_labels = radar.draw_param_labels(ax=axs['radar'], fontsize=20,
-                                           fontproperties=robotto_regular.prop)
+                                           fontproperties=robotto_regular)
     axs['radar'].scatter(vertices1[:, 0], vertices1[:, 1],
                          c=main_color, edgecolors=main_color, marker='o', s=100, zorder=2)
     axs['radar'].scatter(vertices2[:, 0], vertices2[:, 1],
                          c=secondary_color, edgecolors=secondary_color, marker='o', s=100, zorder=2)
 
     title1_text = axs['title'].text(0.01, 0.65, player1['short_name'], fontsize=25, color=main_color,
-                                    fontproperties=robotto_regular.prop, ha='left', va='center')
+                                    fontproperties=robotto_regular, ha='left', va='center')
     title2_text = axs['title'].text(0.01, 0.25, player1['team_shortname'], fontsize=20,
-                                    fontproperties=robotto_regular.prop,
+                                    fontproperties=robotto_regular,
                                     ha='left', va='center', color=main_color)
     title3_text = axs['title'].text(0.99, 0.65, player2['short_name'], fontsize=25,
-                                    fontproperties=robotto_regular.prop,
+                                    fontproperties=robotto_regular,
                                     ha='right', va='center', color=secondary_color)
     title4_text = axs['title'].text(0.99, 0.25, player2['team_shortname'], fontsize=20,
-                                    fontproperties=robotto_regular.prop,
+                                    fontproperties=robotto_regular,
                                     ha='right', va='center', color=secondary_color)
 
     return fig
+
+
+def render_radar(filtered_stats, radar_metrics, player1, player2):
+    """Render radar plot to PNG bytes"""
+
+    fig = create_radar(filtered_stats, radar_metrics, player1, player2)
+
+    image = io.BytesIO()
+    fig.savefig(image, format="png", dpi=DPI, bbox_inches="tight")
+    plt.close(fig)
+
+    return image.getvalue()
@@ -1,176 +1,196 @@
+import plotly.graph_objects as go
 import streamlit as st
-from matplotlib.lines import Line2D
-from src.data.data_loader import load_tracking_data
+from src.data.data_loader import load_match_players, load_tracking_frame, load_tracking_range, manager, pe
+from src.utils.log import log_message
 
-from mplsoccer import Pitch
-from mplsoccer import FontManager
+from src.visualizations.pitch import PLAYBACK_FPS, event_title, render_event, render_playback, sync_event
+from src.visualizations.render_cache import render_cache
+from src.visualizations.render_context import (
+    BACKGROUND_COLOR, LINE_COLOR, HOME_COLOR, AWAY_COLOR, CHOSEN_COLOR, DPI, RENDER_VERSION)
 
 
-# define color constants
-BACKGROUND_COLOR = "#ffffff"
-LINE_COLOR = "#181c1f"
-HOME_COLOR = "#197BBD"
-AWAY_COLOR = "#ED254E"
-PASSING_COLOR = "#F9DC5C"
-CHOSEN_COLOR = "#0C7C59"
+def plot_event(event, passing_options=None):
+    """Plot pitch for event"""
 
+    match_id = event.match_id.iloc[0]
+    event_id = event['event_id'].iloc[0]
 
-def plot_event(event, events=None):
-    """Plot pitch for event"""
+    # the image only changes with the event, the drawing code and the data it is computed from
+    cache = render_cache()
 
-    enriched_tracking_data = load_tracking_data(event.match_id.iloc[0])
+    def key():
+        return cache.key(match_id=match_id, event_id=event_id, options=passing_options is not None,
+                         dpi=DPI, render_version=RENDER_VERSION, data_version=manager.match_version(match_id, pe))
 
-    synced = event.merge(
-        enriched_tracking_data,
-        left_on=["frame_end"],
-        right_on="frame",
-        suffixes=("_event", "_tracking"),
-    )
+    def render():
+        tracking_frame = load_tracking_frame(match_id, event.frame_end.iloc[0])
+        match = load_match_players(match_id).iloc[0]
 
-    pitch = Pitch(
-        pitch_type="skillcorner",
-        line_alpha=0.3,
-        pitch_length=105,
-        pitch_width=68,
-        pitch_color=BACKGROUND_COLOR,
-        line_color=LINE_COLOR,
-        linewidth=1.5,
-    )
+        options = None
+        if passing_options is not None:
+            options = passing_options.get(match_id, event_id)
 
-    fig, ax = pitch.grid(figheight=8, endnote_height=0,
-                         title_height=0.1, title_space=0.02,
-                         axis=False,
-                         )
-
-    # then setup the pitch plot markers we want to animate
-    marker_kwargs = {'marker': 'o',
-                     'linestyle': 'None', 'markeredgecolor': 'None'}
-
-    # plot out of possession team
-    out_of_possession_team = synced[synced.team_id_event !=
-                                    synced.team_id_tracking]
-    ax['pitch'].plot(
-        out_of_possession_team["x"],
-        out_of_possession_team["y"],
-        ms=10,
-        markerfacecolor=AWAY_COLOR,
-        **marker_kwargs
-    )
+        return render_event(event, tracking_frame,
+                            match['match_home_team.name'], match['match_away_team.name'], options)
 
-    # plot possession team
-    possession_team = synced[synced.team_id_event == synced.team_id_tracking]
-    ax['pitch'].plot(
-        possession_team["x"],
-        possession_team["y"],
-        ms=10,
-        markerfacecolor=HOME_COLOR,
-        **marker_kwargs
-    )
+    st.image(cache.get_or_render(key, render), width="stretch")
 
-    # plot ball
-    ax['pitch'].plot(synced.iloc[0].ball_x,
-                     synced.iloc[0].ball_y,
-                     ms=6,
-                     markerfacecolor=BACKGROUND_COLOR,
-                     zorder=3,
-                     marker='o',
-                     linestyle='None',
-                     markeredgecolor=LINE_COLOR
-                     )
-
-    robotto_regular = FontManager()
-
-    if events is not None:
-        associated_events = events[(events['associated_player_possession_event_id'] == event['event_id'].iloc[0]) & (
-            events['match_id'] == event['match_id'].iloc[0])]
-
-        current_passing_x = []
-        current_passing_y = []
-        for id in associated_events.index:
-            event_type = associated_events.loc[id]['event_type']
-            player_id = associated_events.loc[id]['player_id']
-            xt_value = associated_events.loc[id]['xthreat']
-            xpass_completion = round(
-                associated_events.loc[id]['xpass_completion'] * 100, 1)
-
-            player_tracking = synced[synced['player_id_tracking']
-                                     == player_id].iloc[0]
-
-            # add passing option
-            if event_type == 'passing_option':
-                current_passing_x.append(player_tracking['x'])
-                current_passing_y.append(player_tracking['y'])
-
-                label = f"{xpass_completion:.0f}% - {xt_value:.3f} xT"
-
-                # annote passing option values
-                ax['pitch'].annotate(
-                    label,
-                    xy=(player_tracking['x'], player_tracking['y']),
-                    xytext=(5, -10),  # Offset 5 points right and up
-                    textcoords='offset points',
-                    fontsize=9,
-                    color=HOME_COLOR,
-                    bbox=dict(boxstyle='round,pad=0.2', facecolor='white',
-                              edgecolor=HOME_COLOR, alpha=0.7),
-                    fontproperties=robotto_regular.prop
-                )
-
-        # plot passing options
-        ax['pitch'].plot(
-            current_passing_x,
-            current_passing_y,
-            ms=15,
-            marker='o',
-            linestyle='None',
-            markerfacecolor="None",
-            markeredgecolor=HOME_COLOR,
-        )
 
-    # plot target
-    targeted_player_tracking = synced[synced['player_id_tracking']
-                                      == event.player_targeted_id.iloc[0]]
-
-    ax['pitch'].plot(targeted_player_tracking.iloc[0].x,
-                     targeted_player_tracking.iloc[0].y,
-                     ms=10,
-                     markerfacecolor=CHOSEN_COLOR,
-                     **marker_kwargs
-                     )
-
-    # Extract context data for title
-    first_row = synced.iloc[0]
-    home_team = first_row['match_home_team.name']
-    away_team = first_row['match_away_team.name']
-    minute = int(event.iloc[0]['minute_start'])
-    team_score = event.iloc[0]['team_score']
-    opponent_score = event.iloc[0]['opponent_team_score']
-
-    title = f"{home_team} {int(team_score)}-{int(opponent_score)} {away_team} ({minute}min)"
-    ax['title'].text(0.5, 0.5, title,
-                     va='center', ha='center', color='black',
-                     fontproperties=robotto_regular.prop, fontsize=16)
-
-    # Create custom legend handles
-    legend_elements = [
-        Line2D([0], [0], marker='o', color='w', label='Possession Team',
-               markerfacecolor=HOME_COLOR, markersize=10, linestyle='None'),
-        Line2D([0], [0], marker='o', color='w', label='Opposition Team',
-               markerfacecolor=AWAY_COLOR, markersize=10, linestyle='None'),
-        Line2D([0], [0], marker='o', color='w', label='Passing Options',
-               markerfacecolor='None', markeredgecolor=HOME_COLOR,
-               markersize=10, linestyle='None', markeredgewidth=2),
-        Line2D([0], [0], marker='o', color='w', label='Targeted Player',
-               markerfacecolor=CHOSEN_COLOR, markersize=10, linestyle='None'),
+def plot_playback(event, passing_options=None, fps=PLAYBACK_FPS):
+    """Play the possession of an event from frame_start to frame_end"""
+
+    match_id = event.match_id.iloc[0]
+    event_id = event['event_id'].iloc[0]
+
+    # encoded once for every session, a repeat playback is a file read
+    cache = render_cache()
+    def key():
+        return cache.key(kind="playback", match_id=match_id, event_id=event_id,
+                         options=passing_options is not None, fps=fps, dpi=DPI, render_version=RENDER_VERSION,
+                         data_version=manager.match_version(match_id, pe))
+
+    content = cache.get(key(), suffix="gif")
+    if content is None:
+        tracking = load_tracking_range(match_id, event.frame_start.iloc[0], event.frame_end.iloc[0], fps)
+        if tracking.empty:
+            # no frame to play back between the start and the end, show the pass instead
+            log_message(f"No tracking to play back event {event_id} of match {match_id}")
+            plot_event(event, passing_options)
+            return
+
+        match = load_match_players(match_id).iloc[0]
+
+        options = None
+        if passing_options is not None:
+            options = passing_options.get(match_id, event_id)
+
+        content = render_playback(event, tracking,
+                                  match['match_home_team.name'], match['match_away_team.name'], options, fps)
+        # keyed once rendered, the first playback of a match builds the tracking it is keyed on
+        cache.put(key(), content, suffix="gif")
+
+    st.image(content, width="stretch")
+
+
+def pitch_shapes():
+    """Get the lines of a skillcorner pitch as plotly shapes"""
+    length, width = 105 / 2, 68 / 2
+
+    def shape(kind, x0, y0, x1, y1):
+        return dict(type=kind, x0=x0, y0=y0, x1=x1, y1=y1, opacity=0.3, layer="below",
+                    line=dict(color=LINE_COLOR, width=1.5))
+
+    shapes = [
+        shape("rect", -length, -width, length, width),
+        shape("line", 0, -width, 0, width),
+        shape("circle", -9.15, -9.15, 9.15, 9.15),
     ]
+    for side in (-1, 1):
+        # penalty area, goal area and goal of each side
+        shapes.append(shape("rect", side * length, -20.16, side * (length - 16.5), 20.16))
+        shapes.append(shape("rect", side * length, -9.16, side * (length - 5.5), 9.16))
+        shapes.append(shape("rect", side * length, -3.66, side * (length + 2), 3.66))
+
+    return shapes
+
+
+def event_figure(event, tracking_frame, home_team, away_team, options=None):
+    """Build an interactive pitch of an event, drawn by the browser with WebGL"""
+
+    synced = sync_event(event, tracking_frame)
+    # players are named on hover when the tracking frame has their short_name
+    synced['name'] = (synced['short_name'] if 'short_name' in synced else synced['player_id_tracking']).astype(str)
+    marker_line = dict(width=0)
+
+    fig = go.Figure()
+
+    # plot out of possession and possession teams
+    for label, mask, color in [
+        ('Opposition Team', synced.team_id_event != synced.team_id_tracking, AWAY_COLOR),
+        ('Possession Team', synced.team_id_event == synced.team_id_tracking, HOME_COLOR),
+    ]:
+        fig.add_trace(go.Scattergl(
+            x=synced.loc[mask, 'x'],
+            y=synced.loc[mask, 'y'],
+            mode='markers',
+            name=label,
+            marker=dict(size=12, color=color, line=marker_line),
+            text=synced.loc[mask, 'name'],
+            hovertemplate='<b>%{text}</b><extra></extra>',
+        ))
+
+    # plot passing options with their values on hover
+    if options is not None:
+        option_players = options[['player_id', 'xpass_completion', 'xthreat']].merge(
+            synced[['player_id_tracking', 'x', 'y', 'name']],
+            left_on='player_id', right_on='player_id_tracking')
+
+        fig.add_trace(go.Scattergl(
+            x=option_players['x'],
+            y=option_players['y'],
+            mode='markers',
+            name='Passing Options',
+            marker=dict(size=20, color=HOME_COLOR, symbol='circle-open', line=dict(width=2)),
+            text=option_players['name'],
+            customdata=(option_players[['xpass_completion', 'xthreat']] * [100, 1]).to_numpy(),
+            hovertemplate=(
+                '<b>%{text}</b><br>' +
+                'xPass: %{customdata[0]:.0f}%<br>' +
+                'xT: %{customdata[1]:.3f}<br>' +
+                '<extra></extra>'
+            ),
+        ))
+
+    # plot target
+    target = synced[synced['player_id_tracking'] == event.player_targeted_id.iloc[0]]
+    fig.add_trace(go.Scattergl(
+        x=target['x'],
+        y=target['y'],
+        mode='markers',
+        name='Targeted Player',
+        marker=dict(size=12, color=CHOSEN_COLOR, line=marker_line),
+        text=target['name'],
+        hovertemplate='<b>%{text}</b><extra></extra>',
+    ))
+
+    # plot ball
+    fig.add_trace(go.Scattergl(
+        x=synced['ball_x'].iloc[:1],
+        y=synced['ball_y'].iloc[:1],
+        mode='markers',
+        name='Ball',
+        showlegend=False,
+        marker=dict(size=8, color=BACKGROUND_COLOR, line=dict(color=LINE_COLOR, width=1)),
+        hoverinfo='skip',
+    ))
+
+    fig.update_layout(
+        title=dict(text=event_title(event, home_team, away_team), x=0.5, xanchor='center'),
+        shapes=pitch_shapes(),
+        xaxis=dict(range=[-56, 56], visible=False, fixedrange=True),
+        yaxis=dict(range=[-36, 36], visible=False, fixedrange=True,
+                   scaleanchor='x', scaleratio=1),
+        plot_bgcolor=BACKGROUND_COLOR,
+        paper_bgcolor=BACKGROUND_COLOR,
+        legend=dict(orientation='h', yanchor='top', y=0, xanchor='center', x=0.5),
+        margin=dict(l=10, r=10, t=50, b=10),
+        height=520,
+    )
+
+    return fig
+
+
+def plot_event_interactive(event, passing_options=None):
+    """Plot interactive pitch for event"""
+
+    match_id = event.match_id.iloc[0]
+    tracking_frame = load_tracking_frame(match_id, event.frame_end.iloc[0], columns=("team_id", "short_name"))
+    match = load_match_players(match_id).iloc[0]
 
-    # Add legend to the pitch axes
-    ax['pitch'].legend(handles=legend_elements,
-                       frameon=True,
-                       facecolor='white',
-                       edgecolor=None,
-                       fontsize=10,
-                       framealpha=0.9
-                       )
+    options = None
+    if passing_options is not None:
+        options = passing_options.get(match_id, event['event_id'].iloc[0])
 
-    st.pyplot(fig)
+    st.plotly_chart(event_figure(event, tracking_frame,
+                                 match['match_home_team.name'], match['match_away_team.name'], options),
+                    config={'displayModeBar': False})
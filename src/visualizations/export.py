@@ -0,0 +1,241 @@
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from src.data.data_manager import DataManager
+from src.data.passing_evaluation import PassingEvaluation
+from src.utils.log import log_message
+from src.visualizations.pitch import render_event
+from src.visualizations.render_context import DPI
+
+# decision flags a situation can be filtered on, as on the Player Profile page
+DECISIONS = [
+    'highest_xthreat_pass',
+    'safest_pass',
+    'good_pass_opportunity',
+    'missed_good_pass_opportunity',
+]
+
+# columns of the metrics sidecar
+METRICS_COLUMNS = [
+    'match_id',
+    'event_id',
+    'player_id',
+    'player_name',
+    'team_shortname',
+    'minute_start',
+    'team_score',
+    'opponent_team_score',
+    'third_start',
+    'third_end',
+    'pass_outcome',
+    'decision_efficiency',
+    'xthreat_available',
+    'player_targeted_xthreat',
+    'missed_xthreat',
+    *DECISIONS,
+]
+
+# situations rendered per worker task
+CHUNK_SIZE = 20
+
+# quality of the JPEG pages of the PDF
+PDF_QUALITY = 95
+
+# pages appended to the PDF at once, every append reads the cross-references of the pages before
+PDF_PAGES_PER_WRITE = 100
+
+
+def select_situations(possessions, player_ids=None, teams=None, match_ids=None, third="All", decision=None):
+    """Get the possessions matching the filters, in match and time order"""
+
+    selected = PassingEvaluation().third_filter(possessions, third)
+    if player_ids:
+        selected = selected[selected['player_id'].isin(player_ids)]
+    if teams:
+        selected = selected[selected['team_shortname'].isin(teams)]
+    if match_ids:
+        selected = selected[selected['match_id'].isin(match_ids)]
+    if decision is not None:
+        selected = selected[selected[decision] == 1]
+
+    return selected.sort_values(['match_id', 'frame_end'], kind='stable', ignore_index=True)
+
+
+def prepare_match(manager, match_id, frames):
+    """Build the players table and the tracking stores the situations of a match are rendered from"""
+
+    manager.load_player_data(match_id)
+
+    # frames outside of the possessions snapshots need the whole tracking
+    snapshots = manager.load_snapshot_store(match_id)
+    if any(snapshots.frame_position(frame) is None for frame in frames):
+        manager.load_tracking_store(match_id)
+
+
+def render_situations(manager, match_id, events, options):
+    """Render the situations of a single match to PNG bytes, None for the situations missing tracking"""
+
+    match = manager.load_player_data(match_id).iloc[0]
+
+    images = []
+    for position in range(len(events)):
+        event = events.iloc[[position]]
+        tracking_frame = manager.tracking_frame(match_id, event.frame_end.iloc[0])
+
+        # the pass is drawn from the positions of the targeted player and the options at its end frame
+        player_ids = {event.player_targeted_id.iloc[0]}
+        if options[position] is not None:
+            player_ids.update(options[position]['player_id'])
+        missing = sorted(int(player_id) for player_id in player_ids.difference(tracking_frame['player_id']))
+        if missing:
+            log_message(f"Skipping event {event['event_id'].iloc[0]} of match {match_id}: "
+                        f"no tracking of players {missing} at frame {event.frame_end.iloc[0]}")
+            images.append(None)
+            continue
+
+        images.append(render_event(event, tracking_frame,
+                                   match['match_home_team.name'], match['match_away_team.name'],
+                                   options[position]))
+
+    return images
+
+
+def write_pdf_pages(path, images, append=False):
+    """Write PNG images as the pages of a PDF, after its existing pages when appending"""
+
+    # the PNG files are only decoded when their page is written
+    pages = [Image.open(io.BytesIO(image)) for image in images]
+    pages[0].save(path, format="PDF", save_all=True, append_images=pages[1:], append=append,
+                  resolution=DPI, quality=PDF_QUALITY)
+
+
+def export_situations(manager, situations, passing_options, output, output_format="pdf"):
+    """Render the situations in a process pool to a PDF or a PNG folder, with a metrics CSV"""
+
+    # tasks are chunks of a single match so the workers open each tracking store once
+    tasks = []
+    matches = []
+    for match_id, events in situations.groupby('match_id', sort=False):
+        matches.append((match_id, events['frame_end']))
+        for start in range(0, len(events), CHUNK_SIZE):
+            chunk = events.iloc[start:start + CHUNK_SIZE]
+            options = [passing_options.get(match_id, event_id) for event_id in chunk['event_id']]
+            tasks.append((match_id, chunk, options))
+
+    metrics = situations[[column for column in METRICS_COLUMNS if column in situations.columns]]
+    total = len(situations)
+
+    if output_format == "pdf":
+        path = output if output.endswith(".pdf") else f"{output}.pdf"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        metrics_path = f"{path[:-len('.pdf')]}.csv"
+    else:
+        path = output
+        os.makedirs(path, exist_ok=True)
+        metrics_path = f"{path}/metrics.csv"
+
+    # the PDF is moved in place once complete, never leaving a partial file behind
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pages = []
+    # rows of the exported situations, in the order of the pages
+    exported = []
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, manager.workers)) as executor:
+            # each match is prepared by a single process before rendering,
+            # workers building the same store at once would race on its files
+            for future in [executor.submit(prepare_match, manager, *match) for match in matches]:
+                future.result()
+
+            futures = [executor.submit(render_situations, manager, *task) for task in tasks]
+
+            # results are collected in the order of the tasks, pages follow the situations order
+            for (match_id, chunk, _), future in zip(tasks, futures):
+                images = future.result()
+                for row, event_id, image in zip(chunk.index, chunk['event_id'], images):
+                    if image is None:
+                        continue
+
+                    if output_format == "pdf":
+                        pages.append(image)
+                    else:
+                        with open(f"{path}/{match_id}_{event_id}.png", "wb") as f:
+                            f.write(image)
+                    exported.append(row)
+
+                if len(pages) >= PDF_PAGES_PER_WRITE:
+                    write_pdf_pages(tmp_path, pages, append=len(exported) > len(pages))
+                    pages = []
+
+                done += len(images)
+                log_message(f"Rendering situations: {done}/{total} ({match_id})")
+
+        if not exported:
+            log_message("No situations could be rendered")
+            return
+
+        if output_format == "pdf":
+            if pages:
+                write_pdf_pages(tmp_path, pages, append=len(exported) > len(pages))
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # the skipped situations are left out so the rows follow the pages
+    metrics = metrics.loc[exported]
+    if output_format == "pdf":
+        metrics = metrics.assign(page=range(1, len(exported) + 1))
+    else:
+        exported_situations = situations.loc[exported]
+        metrics = metrics.assign(file=[f"{match_id}_{event_id}.png" for match_id, event_id
+                                       in zip(exported_situations['match_id'], exported_situations['event_id'])])
+
+    metrics.to_csv(metrics_path, index=False)
+    log_message(f"Exported {len(exported)} of {total} situations to {path} and {metrics_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the pitch of the passing situations of players, teams or matches")
+    parser.add_argument("--player-id", type=int, nargs="*",
+                        help="only the situations of these players")
+    parser.add_argument("--team", nargs="*",
+                        help="only the situations of these teams short names")
+    parser.add_argument("--match-id", type=int, nargs="*",
+                        help="only the situations of these matches")
+    parser.add_argument("--third", choices=["Attacking", "Middle", "Defensive", "All"], default="All",
+                        help="third of the pitch where the event started or ended")
+    parser.add_argument("--decision", choices=DECISIONS,
+                        help="only the situations flagged with this decision")
+    parser.add_argument("--format", choices=["pdf", "png"], default="pdf",
+                        help="a multi-page PDF or a folder of PNG files")
+    parser.add_argument("--output", default="exports/situations",
+                        help="PDF file or PNG folder, the metrics CSV is written next to it")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of processes rendering the situations")
+    args = parser.parse_args()
+
+    manager = DataManager.from_env(workers=args.workers)
+
+    # the same metrics as the app, computed over all the matches
+    possessions, passing_options = manager.get_data_with_passing_options(
+        columns=PassingEvaluation.columns)
+    possessions, _ = manager.get_data_with_metrics(
+        possessions, passing_options, PassingEvaluation())
+
+    situations = select_situations(possessions, args.player_id, args.team, args.match_id,
+                                   args.third, args.decision)
+    if situations.empty:
+        log_message("No situations match the filters")
+        return
+
+    export_situations(manager, situations, passing_options, args.output, args.format)
+
+
+if __name__ == "__main__":
+    main()
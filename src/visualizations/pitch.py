@@ -0,0 +1,184 @@
+from src.data.tracking_store import TrackingStore
+from src.visualizations.render_context import (
+    BACKGROUND_COLOR, LINE_COLOR, HOME_COLOR, AWAY_COLOR, CHOSEN_COLOR, pitch_renderer, to_gif)
+
+# frames per second of the possession playback
+PLAYBACK_FPS = 5
+
+
+def sync_event(event, tracking_frame):
+    """Join the event with the players positions at its end frame"""
+    return event.merge(
+        tracking_frame,
+        left_on=["frame_end"],
+        right_on="frame",
+        suffixes=("_event", "_tracking"),
+    )
+
+
+def event_title(event, home_team, away_team):
+    """Get the score and minute title of an event"""
+    minute = int(event.iloc[0]['minute_start'])
+    team_score = event.iloc[0]['team_score']
+    opponent_score = event.iloc[0]['opponent_team_score']
+
+    return f"{home_team} {int(team_score)}-{int(opponent_score)} {away_team} ({minute}min)"
+
+
+def draw_event(ax, font, event, tracking_frame, home_team, away_team, options=None):
+    """Draw the players, options and title of an event and return the artists"""
+
+    synced = sync_event(event, tracking_frame)
+
+    artists = []
+
+    # then setup the pitch plot markers we want to animate
+    marker_kwargs = {'marker': 'o',
+                     'linestyle': 'None', 'markeredgecolor': 'None'}
+
+    # plot out of possession team
+    out_of_possession_team = synced[synced.team_id_event !=
+                                    synced.team_id_tracking]
+    artists += ax['pitch'].plot(
+        out_of_possession_team["x"],
+        out_of_possession_team["y"],
+        ms=10,
+        markerfacecolor=AWAY_COLOR,
+        **marker_kwargs
+    )
+
+    # plot possession team
+    possession_team = synced[synced.team_id_event == synced.team_id_tracking]
+    artists += ax['pitch'].plot(
+        possession_team["x"],
+        possession_team["y"],
+        ms=10,
+        markerfacecolor=HOME_COLOR,
+        **marker_kwargs
+    )
+
+    # plot ball
+    artists += ax['pitch'].plot(synced.iloc[0].ball_x,
+                                synced.iloc[0].ball_y,
+                                ms=6,
+                                markerfacecolor=BACKGROUND_COLOR,
+                                zorder=3,
+                                marker='o',
+                                linestyle='None',
+                                markeredgecolor=LINE_COLOR
+                                )
+
+    if options is not None:
+        current_passing_x = []
+        current_passing_y = []
+        for option in options.itertuples():
+            xt_value = option.xthreat
+            xpass_completion = round(option.xpass_completion * 100, 1)
+
+            player_tracking = synced[synced['player_id_tracking']
+                                     == option.player_id].iloc[0]
+
+            # add passing option
+            current_passing_x.append(player_tracking['x'])
+            current_passing_y.append(player_tracking['y'])
+
+            label = f"{xpass_completion:.0f}% - {xt_value:.3f} xT"
+
+            # annote passing option values
+            artists.append(ax['pitch'].annotate(
+                label,
+                xy=(player_tracking['x'], player_tracking['y']),
+                xytext=(5, -10),  # Offset 5 points right and up
+                textcoords='offset points',
+                fontsize=9,
+                color=HOME_COLOR,
+                bbox=dict(boxstyle='round,pad=0.2', facecolor='white',
+                          edgecolor=HOME_COLOR, alpha=0.7),
+                fontproperties=font
+            ))
+
+        # plot passing options
+        artists += ax['pitch'].plot(
+            current_passing_x,
+            current_passing_y,
+            ms=15,
+            marker='o',
+            linestyle='None',
+            markerfacecolor="None",
+            markeredgecolor=HOME_COLOR,
+        )
+
+    # plot target
+    targeted_player_tracking = synced[synced['player_id_tracking']
+                                      == event.player_targeted_id.iloc[0]]
+
+    artists += ax['pitch'].plot(targeted_player_tracking.iloc[0].x,
+                                targeted_player_tracking.iloc[0].y,
+                                ms=10,
+                                markerfacecolor=CHOSEN_COLOR,
+                                **marker_kwargs
+                                )
+
+    artists.append(ax['title'].text(0.5, 0.5, event_title(event, home_team, away_team),
+                                    va='center', ha='center', color='black',
+                                    fontproperties=font, fontsize=16))
+
+    return artists
+
+
+def render_event(event, tracking_frame, home_team, away_team, options=None):
+    """Render the pitch of an event to PNG bytes"""
+    return pitch_renderer().render(
+        lambda ax, font: draw_event(ax, font, event, tracking_frame, home_team, away_team, options))
+
+
+def draw_playback_frame(ax, font, event, tracking_frame, title, option_ids=()):
+    """Draw the players and ball of a possession frame and return the artists"""
+
+    marker_kwargs = {'marker': 'o',
+                     'linestyle': 'None', 'markeredgecolor': 'None'}
+    in_possession = tracking_frame['team_id'] == event.team_id.iloc[0]
+    options = tracking_frame[tracking_frame['player_id'].isin(option_ids)]
+    target = tracking_frame[tracking_frame['player_id'] == event.player_targeted_id.iloc[0]]
+
+    artists = []
+    artists += ax['pitch'].plot(tracking_frame.loc[~in_possession, 'x'], tracking_frame.loc[~in_possession, 'y'],
+                                ms=10, markerfacecolor=AWAY_COLOR, **marker_kwargs)
+    artists += ax['pitch'].plot(tracking_frame.loc[in_possession, 'x'], tracking_frame.loc[in_possession, 'y'],
+                                ms=10, markerfacecolor=HOME_COLOR, **marker_kwargs)
+
+    # follow the passing options and the targeted player of the pass
+    artists += ax['pitch'].plot(options['x'], options['y'], ms=15, marker='o', linestyle='None',
+                                markerfacecolor="None", markeredgecolor=HOME_COLOR)
+    artists += ax['pitch'].plot(target['x'], target['y'],
+                                ms=10, markerfacecolor=CHOSEN_COLOR, **marker_kwargs)
+
+    artists += ax['pitch'].plot(tracking_frame['ball_x'].iloc[:1], tracking_frame['ball_y'].iloc[:1],
+                                ms=6, markerfacecolor=BACKGROUND_COLOR, zorder=3, marker='o',
+                                linestyle='None', markeredgecolor=LINE_COLOR)
+
+    artists.append(ax['title'].text(0.5, 0.5, title,
+                                    va='center', ha='center', color='black',
+                                    fontproperties=font, fontsize=16))
+
+    return artists
+
+
+def render_playback(event, tracking, home_team, away_team, options=None, fps=PLAYBACK_FPS):
+    """Render the frames of a possession to an animated GIF"""
+
+    renderer = pitch_renderer()
+    title = event_title(event, home_team, away_team)
+    option_ids = options['player_id'].tolist() if options is not None else []
+    frame_start = event.frame_start.iloc[0]
+
+    images = []
+    for frame, tracking_frame in tracking.groupby('frame', sort=True):
+        seconds = (frame - frame_start) / TrackingStore.frame_rate
+        images.append(renderer.capture(
+            lambda ax, font: draw_playback_frame(ax, font, event, tracking_frame,
+                                                 f"{title} +{seconds:.1f}s", option_ids),
+            # every frame of the GIF has the size of the pitch
+            crop=renderer.crop))
+
+    return to_gif(images, fps)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from src.utils.log import log_message
+
+RENDER_CACHE_PATH = f"{Path(__file__).parent}/../../cache/renders"
+RENDER_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class RenderCache:
+    """Rendered images on disk shared between sessions and workers, least recently used evicted first"""
+
+    def __init__(self, path, max_bytes=RENDER_CACHE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def key(self, **parts):
+        """Get the key of an image from everything it is rendered from"""
+        # numpy ids read from the tables give the same key as python ids
+        content = json.dumps(parts, sort_keys=True,
+                             default=lambda value: value.item() if hasattr(value, "item") else str(value))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def file_path(self, key, suffix="png"):
+        """Get the file of an image"""
+        return f"{self.path}/{key}.{suffix}"
+
+    def get(self, key, suffix="png"):
+        """Get the bytes of an image or None"""
+        path = self.file_path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            # the modification time orders the images by last use
+            os.utime(path)
+        except FileNotFoundError:
+            # missing or evicted by another worker meanwhile
+            return None
+
+        return content
+
+    def put(self, key, content, suffix="png"):
+        """Store the bytes of an image and evict the oldest images over the size limit"""
+
+        path = self.file_path(key, suffix)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used images until the cache fits in max_bytes"""
+
+        files = []
+        for entry in os.scandir(self.path):
+            # files being written by other workers are not evicted
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already evicted by another worker
+                pass
+            total -= size
+
+        log_message(f"Evicted renders down to {total / 1e6:.2f} MB")
+
+    def get_or_render(self, key, render, suffix="png"):
+        """Get an image from the cache or render and store it, key() gives the key of the image"""
+
+        content = self.get(key(), suffix)
+        if content is not None:
+            return content
+
+        # the key is taken again, rendering may build the data the image is keyed on
+        content = render()
+        self.put(key(), content, suffix)
+        return content
+
+
+@lru_cache(maxsize=None)
+def render_cache():
+    """Get the render cache of the process"""
+    return RenderCache(RENDER_CACHE_PATH)
@@ -0,0 +1,179 @@
+import io
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
+from matplotlib.transforms import Bbox
+from mplsoccer import Pitch
+
+
+FONT_PATH = f"{Path(__file__).parent}/fonts/Roboto-Regular.ttf"
+
+# same resolution as st.pyplot
+DPI = 200
+
+# bump when the drawing code changes so cached renders are not reused
+RENDER_VERSION = 2
+
+# define color constants
+BACKGROUND_COLOR = "#ffffff"
+LINE_COLOR = "#181c1f"
+HOME_COLOR = "#197BBD"
+AWAY_COLOR = "#ED254E"
+PASSING_COLOR = "#F9DC5C"
+CHOSEN_COLOR = "#0C7C59"
+
+# inches added on the right of the pitch figure for the option labels
+LABEL_MARGIN = 1.2
+
+
+@lru_cache(maxsize=None)
+def load_font():
+    """Get the Roboto font bundled with the visualizations"""
+    return FontProperties(fname=FONT_PATH)
+
+
+def to_png(image):
+    """Encode an RGB image array to PNG bytes"""
+
+    # fast compression, the flat pitch colors still compress well
+    content = io.BytesIO()
+    Image.fromarray(image).save(content, format="PNG", compress_level=1)
+    return content.getvalue()
+
+
+def to_gif(images, fps, scale=2):
+    """Encode RGB image arrays to an animated GIF at fps, reduced by scale"""
+
+    if not images:
+        raise ValueError("No images to encode to a GIF")
+
+    frames = [Image.fromarray(image).reduce(scale) for image in images]
+
+    # the pitch, teams and ball colors are all in the first frame
+    palette = frames[0].quantize(colors=128, method=Image.Quantize.MEDIANCUT)
+    frames = [frame.quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames]
+
+    content = io.BytesIO()
+    frames[0].save(content, format="GIF", save_all=True, append_images=frames[1:],
+                   duration=int(1000 / fps), loop=0, optimize=False)
+    return content.getvalue()
+
+
+class PitchRenderer:
+    """Pitch figure drawn once, the artists of each event are blitted over its background"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.font = load_font()
+
+        pitch = Pitch(
+            pitch_type="skillcorner",
+            line_alpha=0.3,
+            pitch_length=105,
+            pitch_width=68,
+            pitch_color=BACKGROUND_COLOR,
+            line_color=LINE_COLOR,
+            linewidth=1.5,
+        )
+
+        self.fig, self.ax = pitch.grid(figheight=8, endnote_height=0,
+                                       title_height=0.1, title_space=0.02,
+                                       axis=False,
+                                       )
+        self.fig.set_dpi(DPI)
+
+        # room on the right for the labels of the options on the touchline,
+        # the axes keep their size and position in inches
+        width, height = self.fig.get_size_inches()
+        self.fig.set_size_inches(width + LABEL_MARGIN, height)
+        scale = width / (width + LABEL_MARGIN)
+        for axes in self.fig.axes:
+            x0, y0, axes_width, axes_height = axes.get_position().bounds
+            axes.set_position([x0 * scale, y0, axes_width * scale, axes_height])
+
+        FigureCanvasAgg(self.fig)
+
+        # Create custom legend handles
+        legend_elements = [
+            Line2D([0], [0], marker='o', color='w', label='Possession Team',
+                   markerfacecolor=HOME_COLOR, markersize=10, linestyle='None'),
+            Line2D([0], [0], marker='o', color='w', label='Opposition Team',
+                   markerfacecolor=AWAY_COLOR, markersize=10, linestyle='None'),
+            Line2D([0], [0], marker='o', color='w', label='Passing Options',
+                   markerfacecolor='None', markeredgecolor=HOME_COLOR,
+                   markersize=10, linestyle='None', markeredgewidth=2),
+            Line2D([0], [0], marker='o', color='w', label='Targeted Player',
+                   markerfacecolor=CHOSEN_COLOR, markersize=10, linestyle='None'),
+        ]
+
+        # Add legend to the pitch axes, drawn over the players of each event
+        self.legend = self.ax['pitch'].legend(handles=legend_elements,
+                                              frameon=True,
+                                              facecolor='white',
+                                              edgecolor=None,
+                                              fontsize=10,
+                                              framealpha=0.9
+                                              )
+        self.legend.set_animated(True)
+
+        # keep the drawn background and its tight crop
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        renderer = self.fig.canvas.get_renderer()
+        self.bbox = Bbox.union([self.fig.get_tightbbox(renderer).transformed(self.fig.dpi_scale_trans),
+                                self.legend.get_window_extent(renderer)])
+        self.crop = self.crop_of(self.bbox)
+
+    def crop_of(self, bbox):
+        """Get the image slices of a bbox in pixels, padded as bbox_inches='tight'"""
+
+        bbox = bbox.padded(0.1 * DPI)
+        width, height = self.fig.canvas.get_width_height()
+        return (
+            slice(max(0, int(height - bbox.y1)), min(height, int(np.ceil(height - bbox.y0)))),
+            slice(max(0, int(bbox.x0)), min(width, int(np.ceil(bbox.x1)))),
+        )
+
+    def render(self, draw):
+        """Blit the artists created by draw(ax, font) over the pitch and return the PNG bytes"""
+        return to_png(self.capture(draw))
+
+    def capture(self, draw, crop=None):
+        """Blit the artists created by draw(ax, font) over the pitch and return the RGB image"""
+
+        with self.lock:
+            canvas = self.fig.canvas
+            canvas.restore_region(self.background)
+
+            artists = draw(self.ax, self.font)
+            try:
+                for artist in artists:
+                    artist.axes.draw_artist(artist)
+                self.ax['pitch'].draw_artist(self.legend)
+
+                # without a crop, the image fits the pitch and the artists drawn outside of it
+                if crop is None:
+                    renderer = canvas.get_renderer()
+                    extents = [artist.get_window_extent(renderer) for artist in [*artists, self.legend]]
+                    crop = self.crop_of(Bbox.union(
+                        [self.bbox, *(extent for extent in extents if np.isfinite(extent.get_points()).all())]))
+
+                image = np.asarray(canvas.buffer_rgba())[crop][..., :3].copy()
+            finally:
+                # leave the figure as the background for the next event
+                for artist in artists:
+                    artist.remove()
+
+        return image
+
+
+@lru_cache(maxsize=None)
+def pitch_renderer():
+    """Get the pitch renderer of the process"""
+    return PitchRenderer()